@@ -1,18 +1,21 @@
 import abc
-import copy
 import enum
+import functools
+import itertools
 import threading
-from collections import namedtuple, OrderedDict
+from collections import namedtuple
 from importlib.resources import Package
-from typing import Dict, Union, List, Tuple, Type
+from typing import Dict, Union, List, Tuple, Type, Callable, Iterator
 
 import pymysql as pymysql
+from dbutils.persistent_db import PersistentDB
 from dbutils.pooled_db import PooledDB, PooledSharedDBConnection, PooledDedicatedDBConnection
 
 from core.dao.mysqldaotools import resolve_field_clause, resolve_filter_clause, resolve_join_clause, \
     resolve_group_by_clause, resolve_order_by_clause, resolve_limit_offset, resolve_translation_of_clauses, \
-    get_field_names_as_str_for_insert, get_field_values_as_str_for_insert, get_fields_with_value_as_str_for_update, \
-    resolve_translation_of_joins
+    get_field_names_as_str_for_insert, get_placeholders_as_str_for_insert, get_field_values_for_insert, \
+    get_fields_as_str_for_update, get_field_values_for_update, resolve_translation_of_joins, get_clause_shape, \
+    get_filter_clause_params
 from core.dao.querytools import FilterClause, OrderByClause, EnumSQLOperationTypes, JoinClause, FieldClause, \
     GroupByClause
 from core.exception.exceptionhandler import CustomException
@@ -20,7 +23,6 @@ from core.exception.exceptionhandler import CustomException
 from core.util.i18nutils import translate
 
 from core.model.modeldefinition import BaseEntity
-from core.util.listutils import optimized_for_loop
 
 _SQLEngineTypes = namedtuple('SQLEngineTypes', ['value', 'engine_name'])
 """Tupla para propiedades de EnumSQLEngineTypes. La uso para poder añadirle una propiedad al enumerado, aparte del 
@@ -40,24 +42,181 @@ class EnumSQLEngineTypes(enum.Enum):
     ORACLE = _SQLEngineTypes(4, 'oracle')
 
 
+PoolStats = namedtuple('PoolStats', ['in_use', 'peak_in_use', 'max_connections'])
+"""Tupla con el estado del pool de conexiones: conexiones en uso en este momento, máximo de conexiones en uso a la vez
+desde que arrancó la aplicación y número máximo de conexiones permitidas (0 o None si no hay límite)."""
+
+_SQL_OPERATION_RESULTS: Dict[EnumSQLOperationTypes, Callable[[any], any]] = {
+    EnumSQLOperationTypes.INSERT: lambda cursor: cursor.lastrowid,
+    EnumSQLOperationTypes.SELECT_ONE: lambda cursor: cursor.fetchone(),
+    EnumSQLOperationTypes.SELECT_MANY: lambda cursor: cursor.fetchall()
+}
+"""Diccionario con la función que devuelve el resultado de cada tipo de operación a partir del cursor. Las operaciones 
+que no estén en el diccionario no devuelven nada."""
+
+
+@functools.lru_cache(maxsize=512)
+def _expand_asterisk_field_clause(entity_type: Type[BaseEntity], field_name: str) -> Tuple[Tuple[str, bool], ...]:
+    """
+    Resuelve los campos que sustituyen a un campo con asterisco. Sólo depende de la entidad base y del nombre del campo,
+    así que se cachea: los mismos patrones ('*', 'entidad_1.*'...) se repiten en casi todas las consultas.
+    :param entity_type: Tipo de la entidad base del dao.
+    :param field_name: Nombre del campo con asterisco.
+    :return: Tupla de pares (nombre del campo, es lazyload).
+    """
+    # Separar el campo por el punto: la entidad que hay que traer será la del último nivel de anidación partiendo de
+    # la entidad base.
+    field_name_array = field_name.split(".")
+
+    # Todos los elementos menos el último son campos anidados dentro de la entidad principal. Los voy recorriendo.
+    last_entity: Type[BaseEntity] = entity_type
+    for val in field_name_array[:-1]:
+        last_entity = last_entity.get_model_dict()[val].field_type  # noqa
+
+    # El último elemento es el asterisco: hay que traer todos los campos de la entidad.
+    new_fields: List[Tuple[str, bool]] = []
+    for k, v in last_entity.get_model_dict().items():
+        # Sólo considero campos que no sean entidades anidadas; ésas se han de resolver en su propio FieldClause con
+        # asterisco.
+        if v.referenced_table_name is None:
+            # El nuevo campo es la concatenación de los campos anteriores con puntos más la clave en sustitución del
+            # asterisco
+            new_fields.append((field_name.replace('*', k), False))
+        else:
+            # Si llega hasta aquí, quiere decir que se ha seleccionado una entidad anidada en general, por ejemplo
+            # entidad_1.entidad_1_1, sin añadir otros campos detrás. En ese caso es un lazyload, es decir, se va a
+            # devolver al usuario un objeto de esa clase pero sólo con el id. La clave es una concatenación de todos los
+            # campos hasta el último no incluido, añadiendo el nombre del campo en el modelo de Python al final. Si sólo
+            # hay un elemento, es un lazyload de la entidad base, no de una entidad anidada sobre la base.
+            new_fields.append((f"{'.'.join(field_name_array[:-1])}.{k}" if len(field_name_array) > 1 else k, True))
+
+    return tuple(new_fields)
+
+
+@functools.lru_cache(maxsize=256)
+def _resolve_select_sql(table: str, fields: Union[Tuple[tuple, ...], None], filters: Union[Tuple[tuple, ...], None],
+                        joins: Union[Tuple[tuple, ...], None], group_by: Union[Tuple[tuple, ...], None],
+                        order_by: Union[Tuple[tuple, ...], None], has_offset: bool, has_limit: bool) -> str:
+    """
+    Genera la sentencia SELECT a partir de la forma de las cláusulas ya traducidas (ver get_clause_shape). Se cachea,
+    dado que muchas consultas se repiten con la misma estructura y sólo cambian los valores de los filtros, que van
+    como parámetros.
+    :param table: Tabla principal de la consulta.
+    :param fields: Formas de los campos seleccionados.
+    :param filters: Formas de los filtros.
+    :param joins: Formas de las cláusulas JOIN.
+    :param group_by: Formas de las cláusulas GROUP BY.
+    :param order_by: Formas de las cláusulas ORDER BY.
+    :param has_offset: Si la consulta tiene offset (sólo se tiene en cuenta si también tiene límite).
+    :param has_limit: Si la consulta tiene límite de registros.
+    :return: Sentencia SQL, con marcadores %s para los valores de los filtros, el offset y el límite.
+    """
+    # Voy añadiendo las partes de la consulta a una lista, sólo las que tengan contenido, y al final las uno con un
+    # espacio. Cada cláusula se resuelve a un string ya sin espacios sobrantes y se concatenan con join, que es la
+    # forma más eficiente de generar la consulta desde las listas.
+    # SELECT (por defecto, asterisco para todos los campos)
+    parts: List[str] = ["SELECT", ' , '.join(map(resolve_field_clause, fields)) if fields else '*', "FROM", table]
+
+    # Resuelvo joins
+    if joins:
+        parts.append(' '.join(map(resolve_join_clause, joins)))
+
+    # Resuelvo filtros: el primero va precedido de WHERE, y el resto del operador que los une al anterior
+    if filters:
+        parts.append(' '.join([f"{'WHERE' if idx == 0 else f.operator_type.operator_keyword} "
+                               f"{resolve_filter_clause(f)}" for idx, f in enumerate(filters)]))
+
+    # Resuelvo group
+    if group_by:
+        parts.append(f"GROUP BY {' , '.join(map(resolve_group_by_clause, group_by))}")
+
+    # Resuelvo order bys
+    if order_by:
+        parts.append(f"ORDER BY {', '.join(map(resolve_order_by_clause, order_by))}")
+
+    # Resuelvo offset y limit: los valores van como parámetros para no multiplicar las entradas de la caché
+    if has_limit:
+        parts.append(resolve_limit_offset(with_offset=has_offset))
+
+    # Generar query
+    return ' '.join(parts)
+
+
 class _BaseConnection(object):
-    """Clase interna para conexión con la base de datos. La idea es que por cada transacción en un hilo se crée un
-    objeto de éstos, y al final de la transacción, ya haya sido consignada o haya hecho rollback, se cierre el cursor
-    y se elimine del ámbito del programa."""
+    """Clase interna para conexión con la base de datos. La idea es que cada hilo tenga un objeto de éstos que se
+    reutiliza en todas sus transacciones: al empezar una se le asigna una conexión del pool y se abre el cursor, y al
+    final de la transacción, ya haya sido consignada o haya hecho rollback, se cierran el cursor y la conexión."""
+
+    __slots__ = ('connection', 'thread_id', 'cursor')
+    """Atributos de la clase. Al declararlos en __slots__ las instancias no tienen diccionario propio, con lo que ocupan
+    menos y el acceso a los atributos es más rápido."""
+
+    # Contadores compartidos por todos los objetos de conexión, para conocer el uso real del pool. Son atributos de
+    # clase: se modifican siempre a través de __count_checkout, bajo el cerrojo.
+    __counter_lock: threading.Lock = threading.Lock()
+    """Cerrojo para modificar los contadores desde varios hilos."""
+    __in_use: int = 0
+    """Número de conexiones obtenidas del pool y aún no devueltas."""
+    __peak_in_use: int = 0
+    """Máximo de conexiones en uso a la vez."""
 
     # CONSTRUCTOR
     def __init__(self, connection: Union[PooledSharedDBConnection, PooledDedicatedDBConnection],
                  thread_id: int):
-        self.connection = connection
+        self.connection = None
         """Objeto de conexión."""
         self.thread_id = thread_id
         """Identificador del hilo."""
-        # Abro un cursor para reusar durante toda la transacción.
         self.cursor = None
         """Cursor SQL."""
-        self.open_cursor()
+        # Si llega una conexión, la asigno y abro un cursor para reusar durante toda la transacción.
+        self.open(connection)
+
+    @classmethod
+    def __count_checkout(cls, increment: int):
+        """
+        Actualiza el número de conexiones en uso.
+        :param increment: 1 al obtener una conexión del pool, -1 al devolverla.
+        :return: Nada.
+        """
+        with cls.__counter_lock:
+            cls.__in_use += increment
+            if cls.__in_use > cls.__peak_in_use:
+                cls.__peak_in_use = cls.__in_use
+
+    @classmethod
+    def get_usage(cls) -> Tuple[int, int]:
+        """
+        Devuelve el uso de conexiones contado por los objetos de conexión.
+        :return: Tupla con el número de conexiones en uso y el máximo que ha habido en uso a la vez.
+        """
+        with cls.__counter_lock:
+            return cls.__in_use, cls.__peak_in_use
 
     # FUNCIONES
+    def open(self, connection: Union[PooledSharedDBConnection, PooledDedicatedDBConnection]):
+        """
+        Asigna una nueva conexión del pool y abre un cursor sobre ella. Si no se puede abrir el cursor, devuelve la
+        conexión al pool y relanza la excepción.
+        :param connection: Objeto de conexión.
+        :return: Nada.
+        """
+        # Si todavía tiene una conexión anterior, la devuelvo al pool antes de asignar la nueva
+        self.close()
+
+        self.connection = connection
+        if connection is not None:
+            try:
+                self.open_cursor()
+            except Exception:
+                # Suelto la referencia antes de cerrarla: no se ha llegado a contar como conexión en uso
+                self.connection = None
+                connection.close()
+                raise
+
+            # Sólo cuento la conexión como en uso una vez que el cursor está abierto
+            type(self).__count_checkout(1)
+
     def open_cursor(self):
         """Abre un cursor."""
         if self.connection:
@@ -68,11 +227,20 @@ class _BaseConnection(object):
         self.connection.commit()
 
     def close(self):
-        """Cierra cursor y conexión."""
-        # Al cerrar la conexión, que primero cierre el cursor.
-        self.cursor.close()
+        """Cierra cursor y conexión. Si ya estaban cerrados, o nunca llegaron a abrirse, no hace nada."""
+        # Al cerrar la conexión, que primero cierre el cursor. Suelto las referencias antes de cerrar para que una
+        # segunda llamada no intente cerrarlos de nuevo.
+        cursor = self.cursor
+        self.cursor = None
+        if cursor is not None:
+            cursor.close()
+
         # Cierra la conexión con la base de datos.
-        self.connection.close()
+        connection = self.connection
+        self.connection = None
+        if connection is not None:
+            connection.close()
+            type(self).__count_checkout(-1)
 
     def rollback(self):
         """Deshace todos los cambios durante la transacción."""
@@ -87,15 +255,25 @@ class BaseDao(object, metaclass=abc.ABCMeta):
     __db_config: dict = None
     """Diccionario con los datos de conexión con la base de datos. Nulo por defecto."""
 
-    __POOL: PooledDB = None
-    """Pool de conexiones para aplicación multihilo, nulo por defecto."""
+    __ss_cursorclass: any = pymysql.cursors.SSDictCursor
+    """Clase del cursor de servidor que se usa en select_stream. Ha de ser del mismo conector que creator."""
+
+    __pool_maxconnections: Union[int, None] = None
+    """Número máximo de conexiones del pool, tal y como se configuró. None si el pool es un PersistentDB, que abre una
+    conexión por hilo sin límite."""
+
+    __POOL: Union[PooledDB, PersistentDB] = None
+    """Pool de conexiones para aplicación multihilo, nulo por defecto. Puede ser un PooledDB, que reparte las conexiones
+    entre todos los hilos, o un PersistentDB, que mantiene una conexión abierta por hilo."""
 
     # Esto es un atributo de clase, todas las instancias de BaseDao lo compartirán, como si fuese una variable
-    # estática.
-    __connected_threads: Dict[int, _BaseConnection] = {}
-    """Diccionario de hilos que ya están conectados. Es un atributo de clase porque todas las instancias de 
-    BaseService deben compartirlo, dado que los servicios asociados a los daos se llaman unos a otros. El identificador 
-    es un entero con el ident del hilo actual, y el valor es un objeto de tipo BaseConnection."""
+    # estática. Al ser un threading.local, cada hilo sólo ve sus propios atributos.
+    __thread_local_data: threading.local = threading.local()
+    """Almacén de datos locales de cada hilo. Es un atributo de clase porque todas las instancias de BaseService deben 
+    compartirlo, dado que los servicios asociados a los daos se llaman unos a otros. Guarda en el atributo 'connection' 
+    el objeto BaseConnection del hilo actual, o None si el hilo no está conectado, y en el atributo 'cursor' el cursor 
+    de esa conexión, para no tener que resolverlo en cada consulta. En el atributo 'base_connection' se conserva el 
+    objeto BaseConnection entre transacciones para no tener que crear uno nuevo en cada una."""
 
     # Constructor
     def __init__(self, table: str, entity_type: type(BaseEntity)):
@@ -104,13 +282,30 @@ class BaseDao(object, metaclass=abc.ABCMeta):
         self.entity_type = entity_type
         """Tipo de entidad."""
 
+        # Las sentencias de modificación de datos sólo dependen de la tabla y del tipo de entidad, así que las resuelvo
+        # una única vez. Los valores se pasan siempre como parámetros.
+        self.__id_field_name: str = entity_type.get_id_field_name()
+        """Nombre del campo id en el modelo de Python."""
+        self.__insert_sql_prefix: str = f"insert into {table} ({get_field_names_as_str_for_insert(entity_type)}) values"
+        """Sentencia INSERT de la entidad sin la lista de valores."""
+        self.__insert_values_row: str = f"({get_placeholders_as_str_for_insert(entity_type)})"
+        """Marcadores de los valores de una entidad en la sentencia INSERT."""
+        self.__insert_sql: str = f"{self.__insert_sql_prefix} {self.__insert_values_row}"
+        """Sentencia INSERT de la entidad."""
+        self.__update_sql: str = f"update {table} set {get_fields_as_str_for_update(entity_type)} " \
+                                 f"where {entity_type.get_id_field_name_in_db()} = %s"
+        """Sentencia UPDATE de la entidad, filtrando por el id."""
+        self.__delete_sql: str = f"delete from {table} where {entity_type.get_id_field_name_in_db()} = %s"
+        """Sentencia DELETE de la entidad, filtrando por el id."""
+
     # Funciones
     @classmethod
     def set_db_config_values(cls, host: str, user: str, password: str, database: str, autocommit: bool = False,
                              charset: str = 'utf8', cursorclass: any = pymysql.cursors.DictCursor,
                              creator: Package = pymysql, maxconnections: int = 5, mincached: int = 3,
                              maxcached: int = 8, maxshared: int = 5, blocking: bool = True, setsession: list = None,
-                             ping: int = 0, db_engine: str = EnumSQLEngineTypes.MYSQL.engine_name):
+                             ping: int = 0, db_engine: str = EnumSQLEngineTypes.MYSQL.engine_name,
+                             persistent: bool = False, ss_cursorclass: any = pymysql.cursors.SSDictCursor):
         """
         Establece los parámetros  de conexión de la base de datos, inicializando el diccionario de parámetros de la
         clase. Luego establecerá el pool de conexiones.
@@ -121,7 +316,10 @@ class BaseDao(object, metaclass=abc.ABCMeta):
         :param autocommit: Hacer commits automáticamente. False por defecto.
         :param charset: Set de caracteres de la base de datos, utf8 por defecto.
         :param cursorclass: Clase del cursor, pymysql.cursors.DictCursor por defecto.
-        :param creator: Paquete de Python que se usará como base para la creación del pool de conexiones.
+        :param creator: Paquete de Python que se usará como base para la creación del pool de conexiones. Por defecto
+        pymysql, que está escrito en Python; con consultas que devuelven muchos registros es más rápido mysqlclient
+        (creator=MySQLdb, cursorclass=MySQLdb.cursors.DictCursor y ss_cursorclass=MySQLdb.cursors.SSDictCursor), que
+        decodifica los registros en C. Ambos usan marcadores %s, así que las sentencias del dao valen igual.
         :param maxconnections: Número máximo de conexiones permitidas en el pool, 0 y None indican sin límite.
         :param mincached: Durante la inicialización, al menos la conexión inactiva creada por el pool de conexiones, 0
         significa no creado.
@@ -132,10 +330,30 @@ class BaseDao(object, metaclass=abc.ABCMeta):
         :param blocking: Si no hay una conexión compartida disponible en el pool, ¿espera el bloqueo? True significa
         esperar, etc. Falso significa no esperar y luego dar un error.
         :param setsession: Lista de comandos ejecutados antes de iniciar sesión.
-        :param ping: El servidor de sql comprueba si el servicio está disponible.
+        :param ping: Cuándo se comprueba que la conexión sigue viva: 0 nunca, 1 al sacarla del pool, 2 al crear un
+        cursor, 4 al ejecutar una consulta y 7 siempre. Para consultas cortas y frecuentes conviene 1, para evitar
+        errores con conexiones caducadas; con transacciones largas basta con 0.
         :param db_engine: Motor de la base de datos.
+        :param persistent: Si True, en lugar de un pool compartido se usa un PersistentDB, que mantiene una conexión
+        dedicada por hilo: el hilo no tiene que volver a conectarse y autenticarse en cada transacción. Conviene con
+        hilos de larga duración (un hilo por trabajador); si se crea un hilo nuevo por petición, es mejor el pool
+        compartido. Con PersistentDB se ignoran maxconnections, mincached, maxcached, maxshared y blocking.
+        :param ss_cursorclass: Clase del cursor de servidor para select_stream, pymysql.cursors.SSDictCursor por
+        defecto. Ha de corresponder al conector indicado en creator.
         :return: Nada.
         """
+        # Compruebo que el número de conexiones inactivas iniciales cabe en el pool: mincached no puede superar ni a
+        # maxcached ni a maxconnections. 0 y None en estos dos significan sin límite. Con PersistentDB estos valores
+        # se ignoran, así que no se comprueban.
+        if not persistent:
+            if mincached and maxcached and mincached > maxcached:
+                raise CustomException(translate("i18n_base_commonError_pool_config", None,
+                                                f"mincached ({mincached}) > maxcached ({maxcached})"))
+
+            if mincached and maxconnections and mincached > maxconnections:
+                raise CustomException(translate("i18n_base_commonError_pool_config", None,
+                                                f"mincached ({mincached}) > maxconnections ({maxconnections})"))
+
         cls.__db_config = {
             'host': host,
             'user': user,
@@ -148,14 +366,16 @@ class BaseDao(object, metaclass=abc.ABCMeta):
 
         # Esto va aparte, para evitar problemas con la conexión del cursor.
         cls.__db_engine = db_engine
+        cls.__ss_cursorclass = ss_cursorclass
 
         # Establecer pool de conexiones.
         cls.__set_pool_values(creator=creator, maxconnections=maxconnections, mincached=mincached, maxcached=maxcached,
-                              maxshared=maxshared, blocking=blocking, setsession=setsession, ping=ping)
+                              maxshared=maxshared, blocking=blocking, setsession=setsession, ping=ping,
+                              persistent=persistent)
 
     @classmethod
     def __set_pool_values(cls, creator: Package, maxconnections: int, mincached: int, maxcached: int, maxshared: int,
-                          blocking: bool, setsession: list, ping: int):
+                          blocking: bool, setsession: list, ping: int, persistent: bool = False):
         """
         Establece los valores para el pool de conexiones. OJO!!! Es impresincible que antes estén establecidos los
         valores de db_config a través de set_db_config_values. Sino no se establecerá el pool de conexiones.
@@ -171,9 +391,21 @@ class BaseDao(object, metaclass=abc.ABCMeta):
         esperar, etc. Falso significa no esperar y luego dar un error.
         :param setsession: Lista de comandos ejecutados antes de iniciar sesión.
         :param ping: Mysql server comprueba si el servicio está disponible.
+        :param persistent: Si True, se usa un PersistentDB con una conexión por hilo en lugar del pool compartido.
         :return: Nada.
         """
         if cls.__db_config:
+            if persistent:
+                # Una conexión por hilo, que se reutiliza en todas sus transacciones. Al cerrarla en disconnect no se
+                # cierra realmente (closeable es False por defecto), y el hilo la vuelve a usar en la siguiente.
+                cls.__POOL = PersistentDB(
+                    creator=creator,
+                    setsession=setsession,
+                    ping=ping,
+                    **cls.__db_config)
+                cls.__pool_maxconnections = None
+                return
+
             cls.__POOL = PooledDB(
                 creator=creator,
                 maxconnections=maxconnections,
@@ -185,33 +417,50 @@ class BaseDao(object, metaclass=abc.ABCMeta):
                 ping=ping,
                 # Descompongo el diccionario con datos para la conexión con la BD.
                 **cls.__db_config)
+            cls.__pool_maxconnections = maxconnections
 
-    @staticmethod
-    def __get_current_thread() -> int:
+    @classmethod
+    def pool_stats(cls) -> Union[PoolStats, None]:
         """
-        Devuelve un identificador del hilo actual de ejecución.
-        :return: int
+        Devuelve el estado actual del pool de conexiones, para poder ajustar su tamaño según la carga real: si el
+        máximo de conexiones en uso a la vez llega al límite, los hilos están esperando en el pool (con blocking) y
+        conviene aumentar maxconnections; si se queda muy por debajo, se puede reducir. Las conexiones se cuentan al
+        obtenerlas del pool en connect y al devolverlas en disconnect, sin depender de atributos internos de DBUtils.
+        :return: PoolStats, o None si todavía no se ha configurado el pool.
         """
-        return threading.get_ident()
+        if cls.__POOL is None:
+            return None
+
+        in_use, peak_in_use = _BaseConnection.get_usage()
+        return PoolStats(in_use=in_use, peak_in_use=peak_in_use, max_connections=cls.__pool_maxconnections)
 
     def connect(self) -> bool:
         """
         Obtiene una conexión del pool para el hilo actual.
         :return: True si ha tenido que conectarse, o False si no ha hecho falta porque el hilo ya tiene una conexión.
         """
-        # Obtener id del hilo para saber si ya está conectado
-        thread_id = type(self).__get_current_thread()
+        # Resuelvo la clase una sola vez y me guardo en una variable local los datos del hilo.
+        cls = type(self)
+        thread_local_data = cls.__thread_local_data
         # Creo un boolean para saber si me he tenido que conectar, con el fin de consignar la operación
         i_had_to_connect = False
 
-        # Conectar (si el hilo no está ya conectado). Dado que _connected_threads es un atributo de clase, todas las
+        # Conectar (si el hilo no está ya conectado). Dado que __thread_local_data es un atributo de clase, todas las
         # instancias de BaseService lo van a compartir, con lo cual si un servicio utiliza otros dentro de una
         # función el hilo seguirá registrado como conectado.
-        if thread_id not in type(self).__connected_threads:
-            # Guardo en el diccionario de hilos conectados una nueva conexión
+        if getattr(thread_local_data, 'connection', None) is None:
+            # Reutilizo el objeto de conexión del hilo, creándolo sólo la primera vez
+            base_connection = getattr(thread_local_data, 'base_connection', None)
+            if base_connection is None:
+                base_connection = _BaseConnection(connection=None, thread_id=threading.get_ident())
+                thread_local_data.base_connection = base_connection
+
+            # Le asigno una nueva conexión y lo guardo en los datos locales del hilo como conexión activa.
             # No hace falta especificarle a __POOL.connection() el hilo, ya lo hace automáticamente.
-            type(self).__connected_threads[thread_id] = _BaseConnection(connection=type(self).__POOL.connection(),
-                                                                        thread_id=thread_id)
+            base_connection.open(cls.__POOL.connection())
+            thread_local_data.connection = base_connection
+            # Me guardo también el cursor, que es lo que se usa en cada consulta
+            thread_local_data.cursor = base_connection.cursor
             # Activo el Boolean para saber que me tuve que conectar
             i_had_to_connect = True
 
@@ -219,64 +468,68 @@ class BaseDao(object, metaclass=abc.ABCMeta):
 
     def disconnect(self):
         """Desconectar de la base de datos."""
-        # Obtengo el hilo actual
-        thread_id = type(self).__get_current_thread()
-
         # Esto no cierra la conexión, sólo la devuelve al pool de conexiones para que su propio hilo la use de nuevo.
         # La conexión se cierra automáticamente cuando termina el hilo.
-        if thread_id in type(self).__connected_threads:
+        thread_local_data = type(self).__thread_local_data
+        connection = getattr(thread_local_data, 'connection', None)
+
+        if connection is not None:
             # Cierro el hilo, aunque técnicamente el poll no lo cerrará hasta que el hilo termine
-            type(self).__connected_threads[thread_id].close()
-            # Quitar hilo del diccionario
-            type(self).__connected_threads.pop(thread_id, None)
+            connection.close()
+            # Quitar la conexión y el cursor de los datos del hilo. El objeto de conexión se conserva en
+            # 'base_connection' para la siguiente transacción.
+            thread_local_data.connection = None
+            thread_local_data.cursor = None
 
-    def commit(self):
-        """Hace commit."""
-        # Obtengo el hilo actual
-        thread_id = type(self).__get_current_thread()
+    def __get_connection(self) -> _BaseConnection:
+        """
+        Devuelve la conexión del hilo actual. Lanza excepción si el hilo no está conectado.
+        :return: _BaseConnection
+        """
+        connection = getattr(type(self).__thread_local_data, 'connection', None)
 
-        if thread_id in type(self).__connected_threads:
-            type(self).__connected_threads[thread_id].commit()
-        else:
+        if connection is None:
             raise CustomException(translate("i18n_base_commonError_database_connection"))
 
-    def rollback(self):
-        """Hace rollback."""
-        # Obtengo el hilo actual
-        thread_id = type(self).__get_current_thread()
+        return connection
 
-        if thread_id in type(self).__connected_threads:
-            type(self).__connected_threads[thread_id].rollback()
-        else:
+    def __get_cursor(self):
+        """
+        Devuelve el cursor de la conexión del hilo actual. Lanza excepción si el hilo no está conectado.
+        :return: Cursor.
+        """
+        cursor = getattr(type(self).__thread_local_data, 'cursor', None)
+
+        if cursor is None:
             raise CustomException(translate("i18n_base_commonError_database_connection"))
 
-    def __execute_query_internal(self, sql, sql_operation_type: EnumSQLOperationTypes = None):
-        """Crea un cursor y ejecuta una query."""
-        # Obtengo el hilo actual
-        thread_id = type(self).__get_current_thread()
+        return cursor
 
-        if thread_id in type(self).__connected_threads:
-            # Obtener cursor
-            cursor = type(self).__connected_threads[thread_id].cursor
+    def commit(self):
+        """Hace commit."""
+        self.__get_connection().commit()
 
-            # Ejecutar query
-            try:
-                cursor.execute(sql)
-
-                # Dependiendo del tipo de operación, podría ser necesario devolver algún valor
-                if sql_operation_type:
-                    if sql_operation_type == EnumSQLOperationTypes.INSERT:
-                        return cursor.lastrowid
-                    elif sql_operation_type == EnumSQLOperationTypes.SELECT_ONE:
-                        return cursor.fetchone()
-                    elif sql_operation_type == EnumSQLOperationTypes.SELECT_MANY:
-                        return cursor.fetchall()
-                    else:
-                        return None
-            except pymysql.Error:
-                raise
-        else:
-            raise CustomException(translate("i18n_base_commonError_database_connection"))
+    def rollback(self):
+        """Hace rollback."""
+        self.__get_connection().rollback()
+
+    def __execute_query_internal(self, sql, sql_operation_type: EnumSQLOperationTypes = None, params: tuple = None):
+        """
+        Ejecuta una query usando el cursor de la conexión del hilo actual.
+        :param sql: Consulta SQL, con marcadores %s para los parámetros.
+        :param sql_operation_type: Tipo de operación, para saber qué se ha de devolver.
+        :param params: Parámetros de la consulta. El conector se encarga de escaparlos.
+        :return: Depende del tipo de operación.
+        """
+        # Obtener cursor de la conexión del hilo actual
+        cursor = self.__get_cursor()
+
+        # Ejecutar query
+        cursor.execute(sql, params)
+
+        # Dependiendo del tipo de operación, podría ser necesario devolver algún valor
+        result_function = _SQL_OPERATION_RESULTS.get(sql_operation_type)
+        return result_function(cursor) if result_function is not None else None
 
     def insert(self, entity: BaseEntity):
         """
@@ -285,11 +538,38 @@ class BaseDao(object, metaclass=abc.ABCMeta):
         :return: Nada.
         """
         # Ejecutar query
-        sql = f"insert into {self.__table} ({get_field_names_as_str_for_insert(entity)}) " \
-              f"values ({get_field_values_as_str_for_insert(entity)}) "
-        index = self.__execute_query_internal(sql, sql_operation_type=EnumSQLOperationTypes.INSERT)
+        index = self.__execute_query_internal(self.__insert_sql, sql_operation_type=EnumSQLOperationTypes.INSERT,
+                                              params=get_field_values_for_insert(entity))
         # A través del cursor, le setteo a la entidad el id asignado en la base de datos
-        setattr(entity, type(entity).get_id_field_name(), index)
+        setattr(entity, self.__id_field_name, index)
+
+    def insert_many(self, entities: List[BaseEntity], batch_size: int = 1000):
+        """
+        Inserta varios registros en la base de datos usando una única sentencia con todos los valores por cada bloque de
+        batch_size entidades, y establece en cada entidad el id asignado en la base de datos. MySQL asigna ids
+        consecutivos a las filas de una misma sentencia INSERT a partir del que devuelve el cursor (con
+        auto_increment_increment = 1, el valor por defecto).
+        :param entities: Lista de objetos del mismo tipo que heredan de BaseEntity.
+        :param batch_size: Número máximo de entidades por sentencia. Limita el tamaño de cada sentencia para que el
+        servidor no la rechace por superar max_allowed_packet.
+        :return: Nada.
+        """
+        # Con 0 range lanzaría ValueError y con un valor negativo no se insertaría nada sin avisar
+        if batch_size < 1:
+            raise CustomException(translate("i18n_base_commonError_batch_size", None, str(batch_size)))
+
+        for start in range(0, len(entities), batch_size):
+            batch = entities[start:start + batch_size]
+
+            # Una sola sentencia con una tupla de marcadores por entidad, y todos los valores seguidos como parámetros
+            sql = f"{self.__insert_sql_prefix} {', '.join([self.__insert_values_row] * len(batch))}"
+            first_id = self.__execute_query_internal(sql, sql_operation_type=EnumSQLOperationTypes.INSERT,
+                                                     params=tuple(itertools.chain.from_iterable(
+                                                         get_field_values_for_insert(e) for e in batch)))
+
+            # El cursor devuelve el id de la primera fila insertada; el resto son los siguientes
+            for new_id, entity in enumerate(batch, start=first_id):
+                setattr(entity, self.__id_field_name, new_id)
 
     def update(self, entity: BaseEntity):
         """
@@ -298,9 +578,8 @@ class BaseDao(object, metaclass=abc.ABCMeta):
         :return: Nada.
         """
         # Ejecutar query
-        sql = f"update {self.__table} set {get_fields_with_value_as_str_for_update(entity)} " \
-              f"where id = {getattr(entity, type(entity).get_id_field_name())}"
-        self.__execute_query_internal(sql)
+        self.__execute_query_internal(self.__update_sql, params=(*get_field_values_for_update(entity),
+                                                                 getattr(entity, self.__id_field_name)))
 
     def delete_entity(self, entity: BaseEntity):
         """
@@ -308,9 +587,7 @@ class BaseDao(object, metaclass=abc.ABCMeta):
         :param entity: Objeto que hereda de BaseEntity.
         :return: Nada.
         """
-        sql = f"delete from {self.__table} where {type(entity).get_id_field_name_in_db()} = " \
-              f"{getattr(entity, type(entity).get_id_field_name())}"
-        self.__execute_query_internal(sql)
+        self.__execute_query_internal(self.__delete_sql, params=(getattr(entity, self.__id_field_name),))
 
     def __from_query_result_dict_to_entity(self, result_as_dict: List[dict],
                                            join_alias_table_name: Dict[str, Tuple[str, Union[str, None],
@@ -327,119 +604,86 @@ class BaseDao(object, metaclass=abc.ABCMeta):
         llegará con todos los campos null salvo el id.
         :return: List[BaseEntity]
         """
-        # Resultado
-        result: List[BaseEntity] = []
+        # Todo lo que depende sólo de los alias de la consulta es igual para todas las filas, así que lo resuelvo antes
+        # de recorrerlas. Para cada alias guardo una tupla con el alias en minúsculas, el nombre de la clave en el
+        # modelo de Python y la ruta de campos anidados (None si el campo es de la entidad principal).
+        column_plan: List[Tuple[str, str, Union[Tuple[str, ...], None]]] = []
+        for k, v in join_alias_table_name.items():
+            # v es una tupla con el nombre del campo en la base de datos, el campo anidado y el tipo de entidad
+            column_plan.append((k.lower(), v[2].get_field_name_from_db_field(v[0]),
+                                tuple(v[1].split(".")) if v[1] is not None else None))
+
+        # Lo mismo para los lazyloads: para cada campo guardo la ruta hasta la entidad que lo contiene, el nombre del
+        # campo, el tipo a instanciar, el nombre de su campo id y un diccionario con todos sus campos a None.
+        lazy_load_plan: List[Tuple[List[str], str, Type[BaseEntity], str, Dict[str, None]]] = []
+        lazy_load_fields_array: List[str]
+        lazy_load_entity_type: Type[BaseEntity]
+        type_for_lazy_property: Type[BaseEntity]
+        if lazy_load_fields:
+            for f in lazy_load_fields:
+                lazy_load_fields_array = f.split(".")
+
+                # Recorro los tipos hasta el penúltimo campo del split para saber qué entidad contiene el campo
+                lazy_load_entity_type = self.entity_type
+                for x in lazy_load_fields_array[:-1]:
+                    lazy_load_entity_type = lazy_load_entity_type.get_model_dict()[x].field_type
+
+                type_for_lazy_property = lazy_load_entity_type.get_model_dict()[lazy_load_fields_array[-1]].field_type
+                lazy_load_plan.append((lazy_load_fields_array[:-1], lazy_load_fields_array[-1],
+                                       type_for_lazy_property, type_for_lazy_property.get_id_field_name(),
+                                       dict.fromkeys(type_for_lazy_property.get_model_dict())))
 
         # Declaración de variables
         field_value: any
-        field_name: str
-        entity_type: Type[BaseEntity]
-        nested_field: str
-        key_name: str
-
-        # Estas dos variables las necesito para resolver el caso de entidades anidadas, para añadir dinámicamente
-        # diccionarios.
-        nested_field_array: list
         last_dict: dict
-
-        new_entity: BaseEntity
-
-        # Comprobar lazyloads
         cursor: BaseEntity
         cursor_dict: dict
-        id_for_lazy_property: any
-        type_for_lazy_property: Type[BaseEntity]
-
-        check_lazy_loads: bool = False
-        lazy_load_fields_array: List[str]
-        if lazy_load_fields is not None and len(lazy_load_fields) > 0:
-            check_lazy_loads = True
 
         # Cada resultado es un diccionario, como una fila del resultado de la consulta.
         for row in result_as_dict:
             # Buscar equivalencia de campos de consulta / definición de campos.
-            for k, v in join_alias_table_name.items():
-                # Busco la coincidencia y modifico "al vuelo" el diccionario de la fila.
-                field_value = row[k.lower()]
-                field_name = v[0]
-                nested_field = v[1]
-                entity_type = v[2]
-                key_name = entity_type.get_field_name_from_db_field(field_name)
-
-                # Si esta variable es distinta de null, significa que es un campo de una entidad anidada.
-                if nested_field is not None:
-                    # Divido el nombre del campo anidado por el separador del punto
-                    nested_field_array = nested_field.split(".")
-
-                    # Si el primer valor no está en el diccionario original, lo introduzco
-                    if nested_field_array[0] not in row:
-                        # Importante modificar el nombre de la clave original de la consulta por el primer valor
-                        # del array, que es el primer campo anidado partiendo de la entidad original del dao
-                        row[nested_field_array[0]] = row.pop(k)
-                        row[nested_field_array[0]] = {}
-
-                    # Modifico esta variable, que es la que va guardando la última referencia del diccionario a
-                    # actualizar
-                    last_dict = row[nested_field_array[0]]
-
-                    # Si tiene más de un elemento, significa que hay elementos anidados dentro del elemento
-                    # anidado
-                    if len(nested_field_array) > 1:
-                        for f in nested_field_array[1:]:
-                            # Si no existe el diccionario, lo añado
-                            if f not in last_dict:
-                                last_dict[f] = {}
-
-                            # Actualizo la referencia al último diccionario
-                            last_dict = last_dict[f]
+            for alias, key_name, nested_field_path in column_plan:
+                # Quito la clave original de la consulta y modifico "al vuelo" el diccionario de la fila.
+                field_value = row.pop(alias)
+
+                # Si la ruta es distinta de null, significa que es un campo de una entidad anidada.
+                if nested_field_path is not None:
+                    # Voy bajando por los diccionarios anidados, creándolos si no existen, hasta llegar al de la
+                    # entidad que contiene el campo
+                    last_dict = row.setdefault(nested_field_path[0], {})
+                    for f in nested_field_path[1:]:
+                        last_dict = last_dict.setdefault(f, {})
 
                     # Finalmente introduzco el valor de la clave correspondiente
                     last_dict[key_name] = field_value
-                    # Importante eliminar la clave original del diccionario de la fila, al haberla tratado y metido
-                    # en un diccionario anidado ya no es necesaria
-                    row.pop(k, None)
                 else:
                     # Sustituyo el alias de la tabla durante la consulta por el nombre de la clave en el
                     # diccionario
-                    row[key_name] = row.pop(k.lower())
                     row[key_name] = field_value
 
-            new_entity = self.entity_type.convert_dict_to_entity(values_dict=row)
+        # Una vez adaptadas todas las filas, las convierto de golpe en entidades.
+        result: List[BaseEntity] = list(map(self.entity_type.convert_dict_to_entity, result_as_dict))
 
-            # Tengo que comprobar los campos lazyload: de la conversión a diccionario ha salido con estos campos no como
-            # entidades sino como un entero. Hay que instanciar nuevos campos de esas entidades con todos los campos
-            # vacíos salvo el id.
-            if check_lazy_loads:
-                for f in lazy_load_fields:
+        # Tengo que comprobar los campos lazyload: de la conversión a diccionario han salido con estos campos no como
+        # entidades sino como un entero. Hay que instanciar nuevos campos de esas entidades con todos los campos
+        # vacíos salvo el id.
+        if lazy_load_plan:
+            for new_entity in result:
+                for path, field_name, type_for_lazy_property, id_field_name, empty_dict in lazy_load_plan:
                     # Empiezo el cursor en la nueva entidad, se trata de llegar hasta la última propiedad e instanciarla
                     # como un nuevo objeto del tipo que sea con todos los campos None salvo el id.
                     cursor = new_entity
-
-                    lazy_load_fields_array = f.split(".")
-                    # Recorro hasta el penúltimo campo del split
-                    for x in lazy_load_fields_array[:-1]:
+                    for x in path:
                         cursor = getattr(cursor, x)
 
-                    # Esto es el id de la nueva entidad que voy a instanciar. También accedo al diccionario de la
-                    # entidad para obtener el tipo a instanciar.
-                    id_for_lazy_property = getattr(cursor, lazy_load_fields_array[-1])
-                    cursor_dict = type(cursor).get_model_dict()
-                    type_for_lazy_property = cursor_dict[lazy_load_fields_array[-1]].field_type
-
-                    # Cojo el diccionario del objeto a instanciar, pero OJO!!! porque hay que clonarlo porque si lo
-                    # cambio sin clonarlo modifico el comportamiento de la clase!!!
-                    cursor_dict = copy.deepcopy(type_for_lazy_property.get_model_dict())
-                    # Si la clave coincide con el nombre de la clave principal, su valor es el que venga de la consulta.
-                    # Cualquier otro campo es None.
-                    for k in cursor_dict.keys():
-                        cursor_dict[k] = id_for_lazy_property if k == type_for_lazy_property.get_id_field_name() \
-                            else None
+                    # Copio el diccionario vacío para no modificar el de otras filas. Si la clave coincide con el
+                    # nombre de la clave principal, su valor es el que venga de la consulta.
+                    cursor_dict = dict(empty_dict)
+                    cursor_dict[id_field_name] = getattr(cursor, field_name)
 
                     # Establezco el atributo instanciando un nuevo objeto del campo lazyload: utilizo el diccionario
                     # anterior y el operador ** para descomponerlo en argumentos clave-valor (quito el warning).
-                    setattr(cursor, lazy_load_fields_array[-1], type_for_lazy_property(**cursor_dict))  # noqa
-
-            result.append(new_entity)
+                    setattr(cursor, field_name, type_for_lazy_property(**cursor_dict))  # noqa
 
         return result
 
@@ -451,49 +695,20 @@ class BaseDao(object, metaclass=abc.ABCMeta):
         :param lazy_load_fields: Mapa con los campos lazy load.
         :return: List[FieldClause]
         """
-        # Separar el campo por el punto: la entidad que hay que traer será la del último nivel de anidación partiendo de
-        # la entidad base.
-        field_name_array = field_clause.field_name.split(".")
         # Al final devuelvo una nueva lista de field clause
         new_field_list: List[FieldClause] = []
 
-        last_entity: Type[BaseEntity] = self.entity_type
-        field_name_array_last_index = len(field_name_array) - 1
-
-        key_for_lazy_load_dict: str
-
-        for idx, val in enumerate(field_name_array):
-            # Si es el último index, ése es el campo que quiero traer.
-            if idx == field_name_array_last_index:
-                for k, v in last_entity.get_model_dict().items():
-                    # Sólo considero campos que no sean entidades anidadas; ésas se han de resolver en su propio
-                    # FieldClause con asterisco.
-                    if v.referenced_table_name is None:
-                        # Añado un nuevo FieldClause, de tal manera que el campo sea la concatenación de los campos
-                        # anteriores con puntos más la clave en sustitución del asterisco
-                        new_field_list.append(FieldClause(field_name=field_clause.field_name.replace('*', k),
-                                                          table_alias=field_clause.table_alias))
-                    else:
-                        # Si llega hasta aquí, quiere decir que se ha seleccionado una entidad anidada en general, por
-                        # ejemplo entidad_1.entidad_1_1, sin añadir otros campos detrás. En ese caso es un lazyload, es
-                        # decir, se va a devolver al usuario un objeto de esa clase pero sólo con el id.
-                        # La clave es una concatenación de todos los campos hasta el último no incluido, añadiendo el
-                        # nombre del campo en el modelo de Python al final.
-                        if idx > 0:
-                            key_for_lazy_load_dict = f"{'.'.join(field_name_array[:-1])}.{k}"
-                        else:
-                            # En este caso, es un lazyload de la entidad base, no de una entidad anidada sobre la base.
-                            key_for_lazy_load_dict = k
-
-                        # No añado el campo inmediatamente, en su lugar lo guardo en el diccionario para comprobar si
-                        # más tarde si realmente lo quiero añadir.
-                        lazy_load_fields[key_for_lazy_load_dict] = FieldClause(field_name=key_for_lazy_load_dict,
-                                                                               table_alias=field_clause.table_alias,
-                                                                               is_lazy_load=True)
+        # La plantilla de campos sólo depende de la entidad y del campo con asterisco, así que viene de la caché; aquí
+        # sólo se crean las cláusulas con el alias de la tabla de la original.
+        for new_field_name, is_lazy_load in _expand_asterisk_field_clause(self.entity_type, field_clause.field_name):
+            if is_lazy_load:
+                # No añado el campo inmediatamente, en su lugar lo guardo en el diccionario para comprobar más tarde
+                # si realmente lo quiero añadir.
+                lazy_load_fields[new_field_name] = FieldClause(field_name=new_field_name,
+                                                               table_alias=field_clause.table_alias,
+                                                               is_lazy_load=True)
             else:
-                # Si no es el último índice significa que es un campo anidado dentro de la entidad principal. Lo voy
-                # almacenando.
-                last_entity = last_entity.get_model_dict()[val].field_type  # noqa
+                new_field_list.append(FieldClause(field_name=new_field_name, table_alias=field_clause.table_alias))
 
         return new_field_list
 
@@ -508,44 +723,35 @@ class BaseDao(object, metaclass=abc.ABCMeta):
         """# Diccionario con los campos lazyload, es decir, aquellos campos de entidades anidadas que no se cargan con
         # todos los campos: sólo se carga el id de éste."""
 
-        # Guardo para cada posición la lista obtenida, para así luego sustituir por posición
-        replace_field_clause_map: OrderedDict[FieldClause, list] = OrderedDict()
-
-        for f in clauses_list:
-            if f.field_name.endswith('*'):
-                replace_field_clause_map[f] = self.__complete_field_clause(f, lazy_load_fields_dict)
-
-        # Elimino las cláusulas con asterisco de las posiciones
-        if len(replace_field_clause_map) > 0:
-            for k in replace_field_clause_map.keys():
-                clauses_list.remove(k)
+        # Guardo para cada cláusula con asterisco la lista obtenida, para así luego sustituirla
+        replace_field_clause_map: Dict[FieldClause, list] = {
+            f: self.__complete_field_clause(f, lazy_load_fields_dict) for f in clauses_list
+            if f.field_name.endswith('*')}
 
-            # Inserto las listas.
-            for v in replace_field_clause_map.values():
-                clauses_list.extend(v)
+        # Elimino las cláusulas con asterisco reconstruyendo la lista en una sola pasada, y después inserto las listas
+        if replace_field_clause_map:
+            clauses_list[:] = [c for c in clauses_list if c not in replace_field_clause_map]
+            clauses_list.extend(itertools.chain.from_iterable(replace_field_clause_map.values()))
 
         # Finalmente, añado los campos LazyLoad pero sólo si no encuentro ya campos que indiquen que la entidad se va a
         # traer por completo.
-        add_to_list: bool
-        for k, v in lazy_load_fields_dict.items():
-            add_to_list = True
-            for c in clauses_list:
-                # Si es un campo no lazyload y empieza por la clave, significa que se están trayendo campos concretos de
-                # ese objeto, por ejemplo cliente.tipo_cliente.codigo implica que no es lazyload, y si tengo una clave
-                # lazyload cliente.tipo_cliente he de descartarla.
-                if not c.is_lazy_load and c.field_name.startswith(k):
-                    add_to_list = False
-                    break
-
-            if add_to_list:
-                clauses_list.append(v)
+        if lazy_load_fields_dict:
+            # Los nombres de los campos no lazyload se calculan una sola vez para todas las claves
+            non_lazy_names = tuple(c.field_name for c in clauses_list if not c.is_lazy_load)
+
+            for k, v in lazy_load_fields_dict.items():
+                # Si hay un campo no lazyload que empieza por la clave, significa que se están trayendo campos concretos
+                # de ese objeto, por ejemplo cliente.tipo_cliente.codigo implica que no es lazyload, y si tengo una
+                # clave lazyload cliente.tipo_cliente he de descartarla.
+                if not any(n.startswith(k) for n in non_lazy_names):
+                    clauses_list.append(v)
 
     def __make_query(self, fields: List[FieldClause] = None, filters: List[FilterClause] = None,
                      order_by: List[OrderByClause] = None, joins: List[JoinClause] = None,
                      group_by: List[GroupByClause] = None,
                      offset: int = None, limit: int = None) -> tuple:
         """
-        Hace la consulta.
+        Prepara la consulta: traduce las cláusulas al modelo de la base de datos y genera la sentencia SQL.
         :param fields: Campos seleccionados. Para seleccionar todos los campos de una de las entidades, pasar asterisco.
         No se traerán los campos de entidades anidadas: para ello, habrá que poner otro FieldClause con el
         nombre del campo a traer (partiendo de la entidad base) seguido de asterisco: 'entidad_anidada_1.*',
@@ -556,8 +762,8 @@ class BaseDao(object, metaclass=abc.ABCMeta):
         :param group_by: Cláusulas GROUP BY.
         :param offset: Offset del límite de la consulta.
         :param limit: Límite de registros.
-        :return: Tupla de tres elementos: Lista de entidades encontradas, diccionario de relación entre alias de las
-        tablas especificadas, y campos lazy_load.
+        :return: Tupla de cuatro elementos: Sentencia SQL, parámetros de la sentencia (None si no tiene), diccionario de
+        relación entre alias de las tablas especificadas, y campos lazy_load.
         """
         # declaro una serie de campos para pasar a la función interna, asumiendo primero que son null.
         filters_translated = None
@@ -615,13 +821,12 @@ class BaseDao(object, metaclass=abc.ABCMeta):
             joins_translated = resolve_translation_of_joins(clauses_list=joins, base_entity_type=self.entity_type,
                                                             table_db_name=self.__table)
 
-        # RESULTADO: Devuelve una lista de diccionarios
-        result_as_dict = self.__select_internal(fields=fields_translated, filters=filters_translated,
+        # RESULTADO: Devuelve la sentencia SQL y sus parámetros
+        sql, params = self.__resolve_select_sql(fields=fields_translated, filters=filters_translated,
                                                 order_by=order_by_translated, joins=joins_translated,
-                                                group_by=group_by_translated, offset=offset,
-                                                limit=limit)
+                                                group_by=group_by_translated, offset=offset, limit=limit)
 
-        return result_as_dict, join_alias_table_name, lazy_load_fields
+        return sql, params, join_alias_table_name, lazy_load_fields
 
     def select(self, fields: List[FieldClause] = None, filters: List[FilterClause] = None,
                order_by: List[OrderByClause] = None, joins: List[JoinClause] = None,
@@ -647,14 +852,20 @@ class BaseDao(object, metaclass=abc.ABCMeta):
         entidades principales del DAO; si False, devuelve una lista de diccionarios.
         :return: Lista de entidades encontradas.
         """
-        # RESULTADO: Devuelve una lista de diccionarios
+        # Preparar la consulta
         select_result: tuple = self.__make_query(fields=fields, filters=filters, order_by=order_by, joins=joins,
                                                  group_by=group_by, offset=offset, limit=limit)
 
-        # El resultado anterior devuelve los tres valores
-        result_as_dict: List[dict] = select_result[0]
-        join_alias_table_name: Dict[str, Tuple[str, Union[str, None], Type[BaseEntity]]] = select_result[1]
-        lazy_load_fields: List[str] = select_result[2]
+        # El resultado anterior devuelve los cuatro valores
+        sql: str = select_result[0]
+        params: Union[tuple, None] = select_result[1]
+        join_alias_table_name: Dict[str, Tuple[str, Union[str, None], Type[BaseEntity]]] = select_result[2]
+        lazy_load_fields: List[str] = select_result[3]
+
+        # RESULTADO: Devuelve una lista de diccionarios
+        result_as_dict: List[dict] = self.__execute_query_internal(sql=sql,
+                                                                   sql_operation_type=EnumSQLOperationTypes.SELECT_MANY,
+                                                                   params=params)
 
         result: (List[BaseEntity], List[dict])
         if convert_to_entity:
@@ -672,12 +883,53 @@ class BaseDao(object, metaclass=abc.ABCMeta):
 
         return result
 
-    def __select_internal(self, fields: List[FieldClause] = None, filters: List[FilterClause] = None,
-                          order_by: List[OrderByClause] = None, joins: List[JoinClause] = None,
-                          group_by: List[GroupByClause] = None,
-                          offset: int = None, limit: int = None) -> List[dict]:
+    def select_stream(self, fields: List[FieldClause] = None, filters: List[FilterClause] = None,
+                      order_by: List[OrderByClause] = None, joins: List[JoinClause] = None,
+                      group_by: List[GroupByClause] = None,
+                      offset: int = None, limit: int = None, chunk_size: int = 1000) -> Iterator[BaseEntity]:
         """
-        Ejecuta una consulta SELECT sobre la tabla principal del dao. Función interna con los campos ya traducidos al
+        Igual que select, pero pensado para resultados grandes: en lugar de traerse todos los registros de golpe usa un
+        cursor de servidor y va leyendo y convirtiendo los registros en bloques. Devuelve un generador de entidades que
+        ha de consumirse por completo dentro de la transacción (es decir, dentro de una función de servicio) y antes de
+        lanzar otra consulta sobre la misma conexión.
+        :param fields: Campos seleccionados. Mismo formato que en select.
+        :param filters: Filtros.
+        :param order_by: Cláusulas ORDER BY.
+        :param joins: Cláusulas JOIN.
+        :param group_by: Cláusulas GROUP BY.
+        :param offset: Offset del límite de la consulta.
+        :param limit: Límite de registros.
+        :param chunk_size: Número de registros que se leen del servidor en cada bloque.
+        :return: Generador de entidades encontradas.
+        """
+        sql, params, join_alias_table_name, lazy_load_fields = self.__make_query(fields=fields, filters=filters,
+                                                                                  order_by=order_by, joins=joins,
+                                                                                  group_by=group_by, offset=offset,
+                                                                                  limit=limit)
+
+        # Abro un cursor de servidor sólo para esta consulta sobre la conexión del hilo actual
+        cursor = self.__get_connection().connection.cursor(type(self).__ss_cursorclass)
+
+        try:
+            cursor.execute(sql, params)
+
+            # Voy leyendo bloques hasta que no queden registros
+            rows: List[dict] = cursor.fetchmany(chunk_size)
+            while rows:
+                yield from self.__from_query_result_dict_to_entity(result_as_dict=rows,
+                                                                   join_alias_table_name=join_alias_table_name,
+                                                                   lazy_load_fields=lazy_load_fields)
+                rows = cursor.fetchmany(chunk_size)
+        finally:
+            # Al cerrarlo se descartan los registros no leídos, con lo que la conexión queda libre
+            cursor.close()
+
+    def __resolve_select_sql(self, fields: List[FieldClause] = None, filters: List[FilterClause] = None,
+                             order_by: List[OrderByClause] = None, joins: List[JoinClause] = None,
+                             group_by: List[GroupByClause] = None,
+                             offset: int = None, limit: int = None) -> Tuple[str, Union[tuple, None]]:
+        """
+        Genera la sentencia SELECT sobre la tabla principal del dao. Función interna con los campos ya traducidos al
         modelo de datos.
         :param fields: Campos seleccionados.
         :param filters: Filtros.
@@ -686,74 +938,28 @@ class BaseDao(object, metaclass=abc.ABCMeta):
         :param group_by: Cláusulas GROUP BY.
         :param offset: Offset del límite de la consulta.
         :param limit: Límite de registros.
-        :return: Diccionario.
-        """
-        # Resuelto SELECT (por defecto, asterisco para todos los campos)
-        select = ''
-        if fields:
-            # Creo un array de strings y luego lo concateno con join. Es la forma más eficiente para generar el filtro
-            # desde las listas.
-            fields_arr = []
-            # Uso una función para bucle for optimizado.
-            optimized_for_loop(fields, resolve_field_clause, fields_arr)
-            # Unir los fields
-            select = ''.join(fields_arr)
-
-        # Resuelvo filtros
-        filtro = ''
+        :return: Tupla con la sentencia SQL, con marcadores %s para los valores de los filtros, y los parámetros que les
+        corresponden (None si no hay ninguno).
+        """
+        # Los valores a comparar de los filtros no van en la sentencia, se pasan como parámetros
+        params: List[any] = []
         if filters:
-            # Creo un array de strings y luego lo concateno con join. Es la forma más eficiente para generar el filtro
-            # desde las listas.
-            filtro_arr = []
-            # Uso una función para bucle for optimizado.
-            optimized_for_loop(filters, resolve_filter_clause, filtro_arr)
-            # Unir los filtros
-            filtro = ''.join(filtro_arr)
-
-        # Resuelvo joins
-        join = ''
-        if joins:
-            # Creo un array de strings y luego lo concateno con join. Es la forma más eficiente para generar el filtro
-            # desde las listas.
-            join_arr = []
-            # Uso una función para bucle for optimizado.
-            optimized_for_loop(joins, resolve_join_clause, join_arr)
-            # Unir los joins
-            join = ''.join(join_arr)
-
-        # Resuelvo group
-        group = ''
-        if group_by:
-            # Creo un array de strings y luego lo concateno con join. Es la forma más eficiente para generar el filtro
-            # desde las listas.
-            group_by_arr = []
-            # Uso una función para bucle for optimizado.
-            optimized_for_loop(group_by, resolve_group_by_clause, group_by_arr)
-            # Unir los groups
-            group = ''.join(group_by_arr)
-
-        # Resuelvo order bys
-        orden = ''
-        if order_by:
-            # Creo un array de strings y luego lo concateno con join. Es la forma más eficiente para generar el filtro
-            # desde las listas.
-            order_by_arr = []
-            # Uso una función para bucle for optimizado.
-            optimized_for_loop(order_by, resolve_order_by_clause, order_by_arr)
-            # Unir los ordenby
-            orden = ''.join(order_by_arr)
-
-        # Resuelvo offset y limit
-        limit_offset = ''
-        if limit is not None:
-            limit_offset = resolve_limit_offset(limit=limit, offset=offset)
-
-        # Ejecutar query
-        sql = f"SELECT {select.strip()} FROM {self.__table} {join.strip()} {filtro.strip()} " \
-              f"{group.strip()} {orden.strip()} {limit_offset.strip()}"
+            for f in filters:
+                get_filter_clause_params(f, params)
 
-        # El resultado es una lista de  diccionarios, pero hay que transformarlo en modelo de datos
-        result_as_dict: List[dict] = self.__execute_query_internal(sql=sql,
-                                                                   sql_operation_type=EnumSQLOperationTypes.SELECT_MANY)
-
-        return result_as_dict
+        # Offset y límite también van como parámetros, después de los de los filtros y en el orden de la cláusula
+        if limit is not None:
+            if offset is not None:
+                params.append(offset)
+            params.append(limit)
+
+        # La sentencia sólo depende de la forma de las cláusulas, así que se resuelve a través de la caché
+        sql = _resolve_select_sql(self.__table,
+                                  tuple(map(get_clause_shape, fields)) if fields else None,
+                                  tuple(map(get_clause_shape, filters)) if filters else None,
+                                  tuple(map(get_clause_shape, joins)) if joins else None,
+                                  tuple(map(get_clause_shape, group_by)) if group_by else None,
+                                  tuple(map(get_clause_shape, order_by)) if order_by else None,
+                                  offset is not None, limit is not None)
+
+        return sql, tuple(params) if params else None
@@ -1,11 +1,12 @@
 import copy
-from typing import List, Union, Type, Dict, Tuple
+import functools
+from collections import namedtuple
+from typing import List, Union, Type, Dict, Tuple, Callable
 
 from core.dao.querytools import EnumFilterTypes, FilterClause, OrderByClause, JoinClause, GroupByClause, FieldClause
 from core.exception.exceptionhandler import CustomException
 from core.model.modeldefinition import BaseEntity, FieldDefinition
 from core.util.i18nutils import translate
-from core.util.listutils import LoopIterationObject
 
 """
 
@@ -63,168 +64,172 @@ _field_alias_separator: str = "$123$"
 """Separador de los alias de los campos, para la traducción del resultado de la consulta al modelo de Python."""
 _join_alias_separator: str = "$456$"
 """Separador de los alias de los joins, para la traducción del resultado de la consulta al modelo de Python."""
+_TranslatedClause = namedtuple('_TranslatedClause', ['field_name', 'table_alias', 'field_alias', 'table_name',
+                                                     'parent_table', 'id_column_name',
+                                                     'parent_table_referenced_column_name',
+                                                     'join_alias_table_name_value'])
+"""Tupla con el resultado de traducir una cláusula. Es inmutable para poder guardarla en la caché de traducciones."""
+
+_LIKE_PATTERNS: Dict[EnumFilterTypes, str] = {
+    EnumFilterTypes.LIKE: "%{}%",
+    EnumFilterTypes.NOT_LIKE: "%{}%",
+    EnumFilterTypes.STARTS_WITH: "{}%",
+    EnumFilterTypes.ENDS_WITH: "%{}"
+}
+"""Patrón con los comodines de cada tipo de filtro LIKE."""
+
+_LIST_FILTER_TYPES: Tuple[EnumFilterTypes, ...] = (EnumFilterTypes.IN, EnumFilterTypes.NOT_IN)
+"""Tipos de filtro cuyo objeto a comparar es una lista de valores."""
+
+FieldClauseShape = namedtuple('FieldClauseShape', ['table_alias', 'field_name', 'field_alias', 'aggregate_function'])
+"""Forma de un campo SELECT ya traducido: todo lo que hace falta para escribirlo en la consulta."""
+FilterClauseShape = namedtuple('FilterClauseShape', ['operator_type', 'start_parenthesis', 'table_alias', 'field_name',
+                                                     'filter_type', 'values_count', 'end_parenthesis'])
+"""Forma de un filtro ya traducido. No incluye los valores a comparar, que van como parámetros de la consulta: sólo 
+cuántos son en los filtros IN y NOT IN, que necesitan un marcador por valor."""
+JoinClauseShape = namedtuple('JoinClauseShape', ['join_type', 'table_name', 'table_alias', 'id_column_name',
+                                                 'parent_table', 'parent_table_referenced_column_name'])
+"""Forma de un join ya traducido."""
+GroupByClauseShape = namedtuple('GroupByClauseShape', ['table_alias', 'field_name'])
+"""Forma de un group by ya traducido."""
+OrderByClauseShape = namedtuple('OrderByClauseShape', ['table_alias', 'field_name', 'order_by_type'])
+"""Forma de un order by ya traducido."""
+
+_CLAUSE_SHAPES: Dict[type, Callable[[any], tuple]] = {
+    FieldClause: lambda c: FieldClauseShape(c.table_alias, c.field_name, c.field_alias, c.aggregate_function),
+    FilterClause: lambda c: FilterClauseShape(c.operator_type, c.start_parenthesis, c.table_alias, c.field_name,
+                                              c.filter_type,
+                                              len(c.object_to_compare) if c.filter_type in _LIST_FILTER_TYPES
+                                              else None, c.end_parenthesis),
+    JoinClause: lambda c: JoinClauseShape(c.join_type, c.table_name, c.table_alias, c.id_column_name, c.parent_table,
+                                          c.parent_table_referenced_column_name),
+    GroupByClause: lambda c: GroupByClauseShape(c.table_alias, c.field_name),
+    OrderByClause: lambda c: OrderByClauseShape(c.table_alias, c.field_name, c.order_by_type)
+}
+"""Función que obtiene la forma de cada tipo de cláusula."""
+
+
+def get_clause_shape(clause: any) -> tuple:
+    """
+    Devuelve la forma de una cláusula ya traducida: una tupla inmutable con lo necesario para escribirla en la consulta,
+    sin los valores a comparar. Dos consultas con las mismas formas generan la misma sentencia SQL, así que se puede
+    usar como clave de caché.
+    :param clause: Cláusula traducida.
+    :return: tuple
+    """
+    return _CLAUSE_SHAPES[type(clause)](clause)
 
 
-def resolve_filter_clause(iteration_object: LoopIterationObject, filtro_arr: List[str]):
+def get_filter_clause_params(item: FilterClause, params: List[any]):
     """
-    Resuelve un filtro, creando un string y añadiéndolo al listado pasado como parámetro.
-    :param iteration_object: Objecto de iteración del bucle optimizado.
-    :param filtro_arr: Listado de strings para almacenar filtros ya resueltos.
+    Añade a la lista de parámetros de la consulta los valores del filtro, en el mismo orden que los marcadores que
+    escribe resolve_filter_clause.
+    :param item: Filtro.
+    :param params: Lista de parámetros de la consulta.
     :return: None.
     """
-    if filtro_arr is not None:
-        # Desde el objeto de iteración obtengo los valores para operar en la función
-        item: FilterClause = iteration_object.item
-        is_first: bool = iteration_object.is_first
-
-        # Añadir tantos paréntesis de inicio como diga el objeto
-        start_parenthesis = ''
-        if item.start_parenthesis:
-            for p in range(item.start_parenthesis):
-                start_parenthesis += '('
-
-        # Añadir tantos paréntesis de fin como diga el objeto
-        end_parenthesis = ''
-        if item.end_parenthesis:
-            for p in range(item.end_parenthesis):
-                end_parenthesis += ')'
-
-        # Tratar el tipo de filtro
-        compare = None
-        if item.filter_type == EnumFilterTypes.LIKE or item.filter_type == EnumFilterTypes.NOT_LIKE:
-            # Filtro LIKE: poner comodín % al principio y al final
-            compare = f"%{item.object_to_compare}%"
-        elif item.filter_type == EnumFilterTypes.STARTS_WITH:
-            # Filtro LIKE: poner comodín % al final
-            compare = f"{item.object_to_compare}%"
-        elif item.filter_type == EnumFilterTypes.ENDS_WITH:
-            # Filtro LIKE: poner comodín % al principio
-            compare = f"%{item.object_to_compare}"
-        elif item.filter_type == EnumFilterTypes.IN or item.filter_type == EnumFilterTypes.NOT_IN:
-            # Filtro IN y NOT IN: el objeto a comparar es una lista, concatenar los elementos por comas
-            if len(item.object_to_compare) > 1:
-                for idx, i in enumerate(item.object_to_compare):
-                    # Si el objeto es string, encerrarlo entre comillas simples
-                    element = f"'{i}'" if isinstance(i, str) else str(i)
-
-                    # Según sea el primer elemento, el último o del medio, tratarlo
-                    if idx == 0:
-                        # Primer elemento
-                        compare = f"({element}"
-                    elif idx == len(item.object_to_compare) - 1:
-                        # Último elemento
-                        compare = f", {element})"
-                    else:
-                        compare = f", {element}"
-            else:
-                compare = f"({str(item.object_to_compare[0])})"
-        else:
-            # En cualquier otro caso, forma de string
-            compare = str(item.object_to_compare)
-
-        # Si el objeto a comparar es un string, encerrarlo entre comillas simples
-        compare = f'\'{compare}\'' if isinstance(item.object_to_compare, str) else compare
-
-        # Crear filtro
-        # Me guardo el operador para concatenar filtros en una variable, para que sea más legible el código
-        operator: str = item.operator_type.operator_keyword
-        filter_too_add = (f"{'WHERE ' if is_first else f' {operator} '}"
-                          f"{start_parenthesis}{item.table_alias}.{item.field_name} {item.filter_type.filter_keyword} "
-                          f"{compare}{end_parenthesis}")
-        filtro_arr.append(filter_too_add)
+    filter_type: EnumFilterTypes = item.filter_type
+    object_to_compare: any = item.object_to_compare
+
+    like_pattern = _LIKE_PATTERNS.get(filter_type)
+    if like_pattern is not None:
+        # Filtros LIKE: el parámetro es el patrón con los comodines % que correspondan
+        params.append(like_pattern.format(object_to_compare))
+    elif filter_type in _LIST_FILTER_TYPES:
+        # Filtro IN y NOT IN: el objeto a comparar es una lista, un parámetro por elemento. Una lista vacía generaría
+        # "IN ()", que no es SQL válido.
+        if not isinstance(object_to_compare, (list, tuple)) or not object_to_compare:
+            raise CustomException(translate("i18n_base_commonError_filter_values", None, filter_type.name,
+                                            f"{item.table_alias}.{item.field_name}"))
+        params.extend(object_to_compare)
+    elif filter_type == EnumFilterTypes.BETWEEN:
+        # Filtro BETWEEN: el objeto a comparar es una lista con los dos extremos, ni más ni menos
+        if not isinstance(object_to_compare, (list, tuple)) or len(object_to_compare) != 2:
+            raise CustomException(translate("i18n_base_commonError_filter_values", None, filter_type.name,
+                                            f"{item.table_alias}.{item.field_name}"))
+        params.extend(object_to_compare)
+    else:
+        # En cualquier otro caso, un único valor
+        params.append(object_to_compare)
 
 
-def resolve_order_by_clause(iteration_object: LoopIterationObject, order_by_arr: List[str]):
+def resolve_filter_clause(item: FilterClauseShape) -> str:
     """
-    Resuelve un order by, creando un string y añadiéndolo al listado pasado como parámetro.
-    :param iteration_object: Objecto de iteración del bucle optimizado.
-    :param order_by_arr: Listado de strings para almacenar order bys ya resueltos.
-    :return: None.
+    Resuelve un filtro, creando un string con la condición. Los valores a comparar no se escriben en la condición: en
+    su lugar se ponen marcadores %s, y get_filter_clause_params obtiene los parámetros que les corresponden. El
+    operador que lo une al filtro anterior (o el WHERE, si es el primero) lo añade quien construye la consulta.
+    :param item: Forma del filtro a resolver.
+    :return: str
     """
-    # Sólo hacer proceso si la lista es no nula
-    if order_by_arr is not None:
-        # Desde el objeto de iteración obtengo los valores para operar en la función
-        item: OrderByClause = iteration_object.item
-        is_first: bool = iteration_object.is_first
+    # Tratar el tipo de filtro
+    if item.filter_type in _LIST_FILTER_TYPES:
+        # Filtro IN y NOT IN: un marcador por elemento separados por comas
+        compare = f"({', '.join(['%s'] * item.values_count)})"
+    elif item.filter_type == EnumFilterTypes.BETWEEN:
+        # Filtro BETWEEN: los dos extremos
+        compare = "%s AND %s"
+    else:
+        # En cualquier otro caso, un único valor
+        compare = "%s"
 
-        # Crear order by: si es el primero de la lista, añadir cláusula ORDER BY, sino añadir coma (si no es el último)
-        order_by_arr.append(f"{'ORDER BY ' if is_first else ', '}"
-                            f"{item.table_alias}.{item.field_name} {item.order_by_type.order_by_keyword}")
+    # Crear filtro, con tantos paréntesis de inicio y de fin como diga el objeto
+    return f"{'(' * item.start_parenthesis if item.start_parenthesis else ''}" \
+           f"{item.table_alias}.{item.field_name} {item.filter_type.filter_keyword} {compare}" \
+           f"{')' * item.end_parenthesis if item.end_parenthesis else ''}"
 
 
-def resolve_join_clause(iteration_object: LoopIterationObject, join_arr: List[str]):
+def resolve_order_by_clause(item: OrderByClauseShape) -> str:
     """
-    Resuelve un join, creando un string y añadiéndolo al listado pasado como parámetro.
-    :param iteration_object: Objecto de iteración del bucle optimizado.
-    :param join_arr: Listado de strings para almacenar joins ya resueltos.
-    :return: None.
+    Resuelve un order by, creando un string con el campo y la dirección de ordenación.
+    :param item: Forma de la cláusula ORDER BY a resolver.
+    :return: str
     """
-    # Sólo hacer proceso si la lista es no nula
-    if join_arr is not None:
-        # Desde el objeto de iteración obtengo los valores para operar en la función
-        item: JoinClause = iteration_object.item
-        # Crear join
-        join_arr.append(f" {item.join_type.join_keyword} {item.table_name} {item.table_alias} "
-                        f"ON {item.table_alias}.{item.id_column_name} = "
-                        f"{item.parent_table}.{item.parent_table_referenced_column_name}")
+    return f"{item.table_alias}.{item.field_name} {item.order_by_type.order_by_keyword}"
 
 
-def resolve_group_by_clause(iteration_object: LoopIterationObject, group_by_arr: List[str]):
+def resolve_join_clause(item: JoinClauseShape) -> str:
     """
-    Resuelve un order by, creando un string y añadiéndolo al listado pasado como parámetro.
-    :param iteration_object: Objecto de iteración del bucle optimizado.
-    :param group_by_arr: Listado de strings para almacenar group bys ya resueltos.
-    :return: None.
+    Resuelve un join, creando un string con la cláusula completa.
+    :param item: Forma de la cláusula JOIN a resolver.
+    :return: str
     """
-    # Sólo hacer proceso si la lista es no nula
-    if group_by_arr is not None:
-        # Desde el objeto de iteración obtengo los valores para operar en la función
-        item: GroupByClause = iteration_object.item
-        is_first: bool = iteration_object.is_first
+    return f"{item.join_type.join_keyword} {item.table_name} {item.table_alias} " \
+           f"ON {item.table_alias}.{item.id_column_name} = " \
+           f"{item.parent_table}.{item.parent_table_referenced_column_name}"
 
-        # Crear group by: si es el primero de la lista, añadir cláusula GROUP BY, sino añadir coma (si no es el último)
-        group_by_arr.append(f"{'GROUP BY ' if is_first else ', '}"
-                            f"{item.table_alias}.{item.field_name} ")
 
+def resolve_group_by_clause(item: GroupByClauseShape) -> str:
+    """
+    Resuelve un group by, creando un string con el campo.
+    :param item: Forma de la cláusula GROUP BY a resolver.
+    :return: str
+    """
+    return f"{item.table_alias}.{item.field_name}"
 
-def resolve_field_clause(iteration_object: LoopIterationObject, select_arr: List[str]):
+
+def resolve_field_clause(item: FieldClauseShape) -> str:
     """
-    Resuelve un order by, creando un string y añadiéndolo al listado pasado como parámetro.
-    :param iteration_object: Objecto de iteración del bucle optimizado.
-    :param select_arr: Listado de strings para almacenar campos SELECT ya resueltos.
-    :return: None.
+    Resuelve un campo de la SELECT, creando un string con el campo y su alias.
+    :param item: Forma del campo a resolver.
+    :return: str
     """
-    # Sólo hacer proceso si la lista es no nula
-    if select_arr is not None:
-        # Desde el objeto de iteración obtengo los valores para operar en la función
-        item: FieldClause = iteration_object.item
-        is_last: bool = iteration_object.is_last
-
-        # Añadir campo a la SELECT, si no es el último añadir comas
-        if item.aggregate_function is not None:
-            # Si es función de agregado, añadirla por delante
-            select_arr.append(f"{item.aggregate_function.function_keyword}({item.table_alias}.{item.field_name}) "
-                              f"{item.field_alias if item.field_alias is not None else ''} "
-                              f"{('' if is_last else ', ')} ")
-        else:
-            select_arr.append(f"{item.table_alias}.{item.field_name} "
-                              f"{item.field_alias if item.field_alias is not None else ''} "
-                              f"{('' if is_last else ', ')} ")
+    field = f"{item.table_alias}.{item.field_name}"
+
+    # Si es función de agregado, añadirla por delante
+    if item.aggregate_function is not None:
+        field = f"{item.aggregate_function.function_keyword}({field})"
 
+    return f"{field} {item.field_alias}" if item.field_alias is not None else field
 
-def resolve_limit_offset(limit: int, offset: int = None) -> str:
+
+def resolve_limit_offset(with_offset: bool = False) -> str:
     """
-    Devuelve un string con la cláusula limit (con offset opcional.)
-    :param limit: Límite de registros de la consulta.
-    :param offset: Índice inferior desde el que comenzar la consulta.
+    Devuelve un string con la cláusula limit (con offset opcional). Los valores no van en la sentencia, sino como
+    marcadores %s: primero el offset, si lo hay, y después el límite.
+    :param with_offset: Si True, la cláusula incluye el marcador del offset.
     :return: Cláusula LIMIT.
     """
-    if offset is not None:
-        limit_offset = f'LIMIT {str(offset)}, {str(limit)}'
-    else:
-        limit_offset = f'LIMIT {str(limit)}'
-
-    return limit_offset
+    return 'LIMIT %s, %s' if with_offset else 'LIMIT %s'
 
 
 def resolve_translation_of_joins(clauses_list: list, base_entity_type: Type[BaseEntity], table_db_name: str):
@@ -275,167 +280,42 @@ def resolve_translation_of_clauses(clause_type: type, clauses_list: list, base_e
     JoinClauses.
     :return: Listado de cláusulas traducidos a mysql.
     """
-    # Declaración de campos a asignar en bucle
     clauses_translated = []
     new_clause: clause_type
-    field_definition: Union[FieldDefinition, None]
-    new_table_alias: Union[str, None]
-    field_name_array: List[str]
-    field_name_array_last_index: int
-    entity_type: Union[Type[BaseEntity], None]
+    translated: _TranslatedClause
 
     is_join_clause: bool = clause_type == JoinClause
     """Indica si es una JoinClause para hacer operaciones especiales."""
 
-    join_parent_table_dict: Dict[str, str]
-    """Esto lo uso para los joins, para poder mantenerlos relacionados. La clave es el nombre del campo y el valor 
-    es el nombre real de la tabla en la base de datos."""
-
     for f in clauses_list:
-        # Copio el objeto entrante
-        new_clause = copy.deepcopy(f)
-
-        field_definition = None
-        new_table_alias = None
-        entity_type = None
-
-        # Si el campo viene con este formato: campo_tabla_1.campo_tabla_2.campo_tabla_3... significa que es
-        # un campo de una clase anidada en el modelo.
-        # Separo el nombre del campo por el punto
-        field_name_array = new_clause.table_name.split(".") if is_join_clause else new_clause.field_name.split(".")
-
-        # De lo que se trata ahora es de ir explorando los campos para resolver la clase exacta del objeto,
-        # así como los atributos del mapeo relacional.
-        field_name_array_last_index = len(field_name_array) - 1
-        if field_name_array_last_index > 0:
-            join_parent_table_dict = {}
-
-            for idx, val in enumerate(field_name_array):
-                # Todos los índices menos el último serán campos relacionales hacia otras entidades.
-                if idx == 0:
-                    # El primero será el de la propia clase del DAO actual
-                    field_definition = base_entity_type.get_model_dict().get(val)
-                elif idx < field_name_array_last_index:
-                    # Voy almacenando la última definición de campo para reutilizarla justo antes de resolver el
-                    # último valor.
-                    field_definition = field_definition.field_type.get_model_dict().get(val)  # noqa
-                else:
-                    # En último índice, antes de volver a reasignar la definición de campo, me quedo con
-                    # algunos datos de la penúltima (que este de hecho la clase a la que pertenece el campo
-                    # como tal).
-                    if is_join_clause:
-                        # Lo que pretendo con esto es mantener una relación entre las tablas para que la cláusula
-                        # join de la consulta sea correcta. Hay tres posibilidades:
-                        # 1. Se ha especificado un alias para la tabla: en ese caso, se usa el alias sin más.
-                        # 2. Es un join desde la tabla principal del dao a una tabla anidada: en ese caso, la tabla
-                        # padre es la del propio dao.
-                        # 3. Es un join a una tabla anidada dentro de otra tabla anidada. En ese caso, lo que hago
-                        # es usar el diccionario de definiciones de campo y acceder al que está una posición
-                        # atrás, dado que el campo referenced_table_name hará referencia al nombre en la base de
-                        # datos de la tabla padre del campo final: cliente.tipo_cliente.usuario -> En este caso voy
-                        # a hacer join a usuario, su tabla padre es tipo_cliente, la definición de campo que
-                        # contiene el nombre de la tabla de tipos de cliente está en clientes.
-                        field_definition = field_definition.field_type.get_model_dict().get(val)
-                        new_clause.parent_table = new_clause.parent_table if new_clause.parent_table is not None \
-                            else join_parent_table_dict[field_name_array[field_name_array_last_index - idx]]
-
-                    # Si no tiene alias, el alias es la concatenación de todos los campos anidados hasta el íncidice
-                    # final no incluido, reemplazando los puntos por guiones. Lo hago así para evitar errores cuando
-                    # dos tablas tienen un campo que se llama igual y quiero traerme los dos. Si es una join clause,
-                    # que coja todos los elementos, lo de llegar hasta el penúltimo es para el resto porque las join
-                    # clauses son las distintas tablas como tal y el resto de cláusulas son campos de las mismas.
-                    new_table_alias = new_clause.table_alias if new_clause.table_alias is not None else \
-                        _join_alias_separator.join(field_name_array if is_join_clause else field_name_array[0:-1])
-
-                    # Lo compruebo por si acaso, pero no debería hacer falta, si llega hasta aquí el tipo debe ser
-                    # BaseEntity.
-                    if not is_join_clause and issubclass(field_definition.field_type, BaseEntity):
-                        entity_type = field_definition.field_type
-                        field_definition = entity_type.get_model_dict().get(val)  # noqa
-
-                # Añadir al mapa de los joins una clave-valor: clave es el nombre del campo, valor es la tabla
-                # relacionada.
-                try:
-                    join_parent_table_dict[val] = field_definition.referenced_table_name
-                except AttributeError:
-                    # Si se produce esta excepción, es que se ha enviado un campo que no existe
-                    raise CustomException(
-                        translate("i18n_base_commonError_unknown_field", None, val, field_name_array[idx - 1]))
+        # La traducción sólo depende de la estructura de la cláusula (campo, alias y, en los joins, las columnas
+        # de enlace), nunca de los valores a comparar, así que se resuelve a través de la caché.
+        if is_join_clause:
+            translated = _translate_clause(clause_type, base_entity_type, table_db_name, f.table_name, f.table_alias,
+                                           f.parent_table, f.parent_table_referenced_column_name, f.id_column_name)
         else:
-            # En caso de que sea un campo normal, el alias será el que venga en la entidad o bien el nombre de
-            # la tabla del DAO.
-            field_definition = base_entity_type.get_model_dict().get(f.table_name if is_join_clause else f.field_name)
-
-            if is_join_clause:
-                # La tabla padre será la del propio dao
-                new_clause.parent_table = new_clause.parent_table if new_clause.parent_table is not None \
-                    else table_db_name
-            else:
-                # Si no es una join clause y sólo hay un campo tras el split, la entidad será la del dao
-                new_table_alias = new_clause.table_alias if new_clause.table_alias is not None else table_db_name
-                entity_type = base_entity_type
-
-                # Si en este punto fuese null la definición de campo, es que dicho campo no existe.
-                if field_definition is None:
-                    raise CustomException(
-                        translate("i18n_base_commonError_unknown_field", None, f.field_name, base_entity_type.__name__))
-
-        # Parte especial para cláusulas join
-        if is_join_clause and field_definition is not None:
-            # La tabla será la tabla referenciada
-            new_clause.table_name = field_definition.referenced_table_name
-
-            # El alias será también el nombre de la tabla
-            if new_table_alias is None:
-                new_table_alias = new_clause.table_alias if new_clause.table_alias is not None else \
-                    field_name_array[-1]
-
-            # Nombre del campo id de la clase
-            if new_clause.id_column_name is None:
-                if issubclass(field_definition.field_type, BaseEntity):
-                    new_clause.id_column_name = field_definition.field_type.get_id_field_name_in_db()  # noqa
-                else:
-                    # Esto no debería suceder.
-                    raise CustomException(
-                        translate("i18n_base_commonError_query_translate", None, str(new_clause)))
-
-            # Nombre del campo referenciado en la base de datos
-            if new_clause.parent_table_referenced_column_name is None:
-                new_clause.parent_table_referenced_column_name = field_definition.name_in_db
-
-        # Lanzar error si no existe uno de estos objetos
-        if field_definition is None or new_table_alias is None or (clause_type == FieldClause
-                                                                   and entity_type is None):
-            raise CustomException(translate("i18n_base_commonError_query_translate", None, str(new_clause)))
-
-        # Sustituyo el nombre del campo por el equivalente en la base de datos
-        new_clause.field_name = field_definition.name_in_db
-        # Asignar el alias de la tabla resuelto anteriormente
-        # Si es una join clause, si no hay alias debe utilizar lo que especifique la definición del campo
-        new_clause.table_alias = new_table_alias
+            translated = _translate_clause(clause_type, base_entity_type, table_db_name, f.field_name, f.table_alias)
+
+        # Copio el objeto entrante y le aplico la traducción. Basta con una copia superficial: sólo se reasignan
+        # atributos, nunca se modifican los objetos a los que apuntan (como la lista de valores de un filtro IN).
+        new_clause = copy.copy(f)
+        new_clause.field_name = translated.field_name
+        new_clause.table_alias = translated.table_alias
 
         if is_join_clause:
+            new_clause.table_name = translated.table_name
+            new_clause.parent_table = translated.parent_table
+            new_clause.id_column_name = translated.id_column_name
+            new_clause.parent_table_referenced_column_name = translated.parent_table_referenced_column_name
+
             # Añadir al mapa de joins y alias una nueva clave-valor: la clave es el nombre de la tabla referenciada y el
-            # valor es el nombre del join
-            if new_clause.table_name not in join_alias_dict:
-                join_alias_dict[new_clause.table_name] = new_clause.table_alias
-        else:
+            # valor es el nombre del join. Si la tabla ya estaba, se mantiene el alias del primer join.
+            join_alias_dict.setdefault(new_clause.table_name, new_clause.table_alias)
+        elif clause_type == FieldClause:
             # Establecer alias de los campos seleccionados, lo necesito para transformar el resultado de la consulta
             # en objetos Python. En este caso el alias lo establezco yo, ignorando lo que me pueda haber llegado.
-            if clause_type == FieldClause:
-                f_alias = _field_alias_separator.join(new_clause.table_alias.split('.'))
-                f_alias = f'{f_alias}{_field_alias_separator}{field_name_array[-1]}'
-                new_clause.field_alias = f_alias
-
-                # Añado nueva clave al mapa de alias. La clave es el alias concatenado con el campo seleccionado
-                # (último elemento de la lista anterior). El valor será el tipo de entidad y el nombre del campo
-                # correspondiente en el modelo de Python. Como tercer valor paso None si sólo es un campo, o todos los
-                # campos hasta el último no incluido si son más: lo necesitaré para convertir el diccionario resultante
-                # a objetos Python, para saber a qué campo corresponde en cada clase. El cuarto valor es el último
-                # índice, que me indica el nivel de anidación de entidades partiendo de la base del dao.
-                join_alias_table_name[new_clause.field_alias] = \
-                    (new_clause.field_name, ('.'.join(field_name_array[:-1]) if field_name_array_last_index > 0
-                                             else None), entity_type)
+            new_clause.field_alias = translated.field_alias
+            join_alias_table_name[new_clause.field_alias] = translated.join_alias_table_name_value
 
         # Lo añado a la lista
         clauses_translated.append(new_clause)
@@ -443,102 +323,284 @@ def resolve_translation_of_clauses(clause_type: type, clauses_list: list, base_e
     return clauses_translated
 
 
-def get_field_names_as_str_for_insert(base_entity: BaseEntity):
+def _describe_clause(clause_type: type, table_db_name: str, field_name: str, table_alias: Union[str, None]) -> str:
+    """
+    Describe una cláusula para los mensajes de error de la traducción, con el mismo formato que el str de las
+    cláusulas: tipo de cláusula, tabla principal de la consulta, alias y ruta del campo (o de la tabla en los joins).
+    :param clause_type: Tipo de cláusula.
+    :param table_db_name: Nombre de la tabla principal de la consulta.
+    :param field_name: Nombre del campo según el modelo de Python (en las JoinClause, el nombre de la tabla).
+    :param table_alias: Alias de la tabla.
+    :return: str
+    """
+    return f"{clause_type.__name__}({'table_name' if clause_type == JoinClause else 'field_name'}={field_name}, " \
+           f"table_alias={table_alias}, table={table_db_name})"
+
+
+@functools.lru_cache(maxsize=256)
+def _translate_clause(clause_type: type, base_entity_type: Type[BaseEntity], table_db_name: str, field_name: str,
+                      table_alias: Union[str, None], parent_table: str = None,
+                      parent_table_referenced_column_name: str = None,
+                      id_column_name: str = None) -> _TranslatedClause:
+    """
+    Traduce la estructura de una cláusula al modelo de la base de datos. Es una función pura de sus parámetros, así que
+    se cachea: las consultas con la misma forma se repiten mucho (por ejemplo, los listados de los servicios).
+    :param clause_type: Tipo de cláusula.
+    :param base_entity_type: Tipo de la entidad base de la tabla principal de la consulta.
+    :param table_db_name: Nombre de la tabla principal de la consulta.
+    :param field_name: Nombre del campo según el modelo de Python (en las JoinClause, el nombre de la tabla).
+    :param table_alias: Alias de la tabla.
+    :param parent_table: Tabla padre. Sólo para JoinClause.
+    :param parent_table_referenced_column_name: Nombre de la columna referenciada en la tabla padre. Sólo para
+    JoinClause.
+    :param id_column_name: Nombre de la columna id de la tabla a enlazar. Sólo para JoinClause.
+    :return: _TranslatedClause
+    """
+    field_definition: Union[FieldDefinition, None] = None
+    new_table_alias: Union[str, None] = None
+    entity_type: Union[Type[BaseEntity], None] = None
+    table_name: Union[str, None] = None
+
+    is_join_clause: bool = clause_type == JoinClause
+    """Indica si es una JoinClause para hacer operaciones especiales."""
+
+    join_parent_table_dict: Dict[str, str]
+    """Esto lo uso para los joins, para poder mantenerlos relacionados. La clave es el nombre del campo y el valor 
+    es el nombre real de la tabla en la base de datos."""
+
+    # Si el campo viene con este formato: campo_tabla_1.campo_tabla_2.campo_tabla_3... significa que es
+    # un campo de una clase anidada en el modelo.
+    # Separo el nombre del campo por el punto
+    field_name_array: List[str] = field_name.split(".")
+
+    # De lo que se trata ahora es de ir explorando los campos para resolver la clase exacta del objeto,
+    # así como los atributos del mapeo relacional.
+    field_name_array_last_index: int = len(field_name_array) - 1
+    if field_name_array_last_index > 0:
+        join_parent_table_dict = {}
+
+        for idx, val in enumerate(field_name_array):
+            # Todos los índices menos el último serán campos relacionales hacia otras entidades.
+            if idx == 0:
+                # El primero será el de la propia clase del DAO actual
+                field_definition = base_entity_type.get_model_dict().get(val)
+            elif idx < field_name_array_last_index:
+                # Voy almacenando la última definición de campo para reutilizarla justo antes de resolver el
+                # último valor.
+                field_definition = field_definition.field_type.get_model_dict().get(val)  # noqa
+            else:
+                # En último índice, antes de volver a reasignar la definición de campo, me quedo con
+                # algunos datos de la penúltima (que este de hecho la clase a la que pertenece el campo
+                # como tal).
+                if is_join_clause:
+                    # Lo que pretendo con esto es mantener una relación entre las tablas para que la cláusula
+                    # join de la consulta sea correcta. Hay tres posibilidades:
+                    # 1. Se ha especificado un alias para la tabla: en ese caso, se usa el alias sin más.
+                    # 2. Es un join desde la tabla principal del dao a una tabla anidada: en ese caso, la tabla
+                    # padre es la del propio dao.
+                    # 3. Es un join a una tabla anidada dentro de otra tabla anidada. En ese caso, lo que hago
+                    # es usar el diccionario de definiciones de campo y acceder al que está una posición
+                    # atrás, dado que el campo referenced_table_name hará referencia al nombre en la base de
+                    # datos de la tabla padre del campo final: cliente.tipo_cliente.usuario -> En este caso voy
+                    # a hacer join a usuario, su tabla padre es tipo_cliente, la definición de campo que
+                    # contiene el nombre de la tabla de tipos de cliente está en clientes.
+                    field_definition = field_definition.field_type.get_model_dict().get(val)
+                    parent_table = parent_table if parent_table is not None \
+                        else join_parent_table_dict[field_name_array[field_name_array_last_index - idx]]
+
+                # Si no tiene alias, el alias es la concatenación de todos los campos anidados hasta el íncidice
+                # final no incluido, reemplazando los puntos por guiones. Lo hago así para evitar errores cuando
+                # dos tablas tienen un campo que se llama igual y quiero traerme los dos. Si es una join clause,
+                # que coja todos los elementos, lo de llegar hasta el penúltimo es para el resto porque las join
+                # clauses son las distintas tablas como tal y el resto de cláusulas son campos de las mismas.
+                new_table_alias = table_alias if table_alias is not None else \
+                    _join_alias_separator.join(field_name_array if is_join_clause else field_name_array[0:-1])
+
+                # Lo compruebo por si acaso, pero no debería hacer falta, si llega hasta aquí el tipo debe ser
+                # BaseEntity.
+                if not is_join_clause and issubclass(field_definition.field_type, BaseEntity):
+                    entity_type = field_definition.field_type
+                    field_definition = entity_type.get_model_dict().get(val)  # noqa
+
+            # Si no hay definición de campo, es que se ha enviado un campo que no existe
+            if field_definition is None:
+                raise CustomException(
+                    translate("i18n_base_commonError_unknown_field", None, val, field_name_array[idx - 1]))
+
+            # Añadir al mapa de los joins una clave-valor: clave es el nombre del campo, valor es la tabla
+            # relacionada.
+            join_parent_table_dict[val] = field_definition.referenced_table_name
+    else:
+        # En caso de que sea un campo normal, el alias será el que venga en la entidad o bien el nombre de
+        # la tabla del DAO.
+        field_definition = base_entity_type.get_model_dict().get(field_name)
+
+        if is_join_clause:
+            # La tabla padre será la del propio dao
+            parent_table = parent_table if parent_table is not None else table_db_name
+        else:
+            # Si no es una join clause y sólo hay un campo tras el split, la entidad será la del dao
+            new_table_alias = table_alias if table_alias is not None else table_db_name
+            entity_type = base_entity_type
+
+            # Si en este punto fuese null la definición de campo, es que dicho campo no existe.
+            if field_definition is None:
+                raise CustomException(
+                    translate("i18n_base_commonError_unknown_field", None, field_name, base_entity_type.__name__))
+
+    # Parte especial para cláusulas join
+    if is_join_clause and field_definition is not None:
+        # La tabla será la tabla referenciada
+        table_name = field_definition.referenced_table_name
+
+        # El alias será también el nombre de la tabla
+        if new_table_alias is None:
+            new_table_alias = table_alias if table_alias is not None else field_name_array[-1]
+
+        # Nombre del campo id de la clase
+        if id_column_name is None:
+            if issubclass(field_definition.field_type, BaseEntity):
+                id_column_name = field_definition.field_type.get_id_field_name_in_db()  # noqa
+            else:
+                # Esto no debería suceder.
+                raise CustomException(translate("i18n_base_commonError_query_translate", None,
+                                                _describe_clause(clause_type, table_db_name, field_name, table_alias)))
+
+        # Nombre del campo referenciado en la base de datos
+        if parent_table_referenced_column_name is None:
+            parent_table_referenced_column_name = field_definition.name_in_db
+
+    # Lanzar error si no existe uno de estos objetos
+    if field_definition is None or new_table_alias is None or (clause_type == FieldClause and entity_type is None):
+        raise CustomException(translate("i18n_base_commonError_query_translate", None,
+                                        _describe_clause(clause_type, table_db_name, field_name, table_alias)))
+
+    field_alias: Union[str, None] = None
+    join_alias_table_name_value: Union[Tuple[str, Union[str, None], Type[BaseEntity]], None] = None
+    if clause_type == FieldClause:
+        # Alias del campo seleccionado: el alias de la tabla seguido del campo (último elemento de la lista anterior)
+        field_alias = f'{_field_alias_separator.join(new_table_alias.split("."))}{_field_alias_separator}' \
+                      f'{field_name_array[-1]}'
+
+        # Valor para el mapa de alias. El valor será el nombre del campo en la base de datos y, como segundo valor,
+        # None si sólo es un campo, o todos los campos hasta el último no incluido si son más: lo necesitaré para
+        # convertir el diccionario resultante a objetos Python, para saber a qué campo corresponde en cada clase. El
+        # tercer valor es el tipo de entidad.
+        join_alias_table_name_value = (field_definition.name_in_db,
+                                       ('.'.join(field_name_array[:-1]) if field_name_array_last_index > 0 else None),
+                                       entity_type)
+
+    # Sustituyo el nombre del campo por el equivalente en la base de datos y asigno el alias de la tabla resuelto
+    return _TranslatedClause(field_name=field_definition.name_in_db, table_alias=new_table_alias,
+                             field_alias=field_alias, table_name=table_name, parent_table=parent_table,
+                             id_column_name=id_column_name,
+                             parent_table_referenced_column_name=parent_table_referenced_column_name,
+                             join_alias_table_name_value=join_alias_table_name_value)
+
+
+def get_field_names_as_str_for_insert(base_entity_type: Type[BaseEntity]):
     """
     Devuelve una cadena con los nombres de los campos separados por comas.
-    :param base_entity: Entidad base.
+    :param base_entity_type: Tipo de la entidad base.
     :return: Una cadena de los campos de la entidad cuyo primer valor será el campo del id.
     """
-    base_entity_type = type(base_entity)
-    cadena: str = base_entity_type.get_id_field_name_in_db()
+    id_field_name = base_entity_type.get_id_field_name()
 
-    # Recorrer los nombres de los campos del objeto e ir concatenándolos separados por comas
-    d = base_entity_type.get_model_dict()
-    for key, value in d.items():
+    # Empiezo por el id, y voy añadiendo a la lista los nombres de los campos del objeto para unirlos al final
+    fields: List[str] = [base_entity_type.get_id_field_name_in_db()]
+    for key, value in base_entity_type.get_model_dict().items():
         # key es un string con el nombre del campo dentro del objeto.
         # Value es una objeto de tipo FieldDefinition
-        if key != base_entity_type.get_id_field_name():
-            cadena += ", " + value.name_in_db
+        if key != id_field_name:
+            fields.append(value.name_in_db)
 
-    return cadena
+    return ", ".join(fields)
 
 
-def get_field_values_as_str_for_insert(base_entity: BaseEntity, is_id_included: bool = False):
+def get_placeholders_as_str_for_insert(base_entity_type: Type[BaseEntity]):
     """
-    Devuelve una cadena con los valores de los campos de la entidad encadenados por comas
-    :param base_entity: Entidad base.
-    :param is_id_included: Si True, empieza por el valor del campo id; si False, empieza con "null". False
-    por defecto.
+    Devuelve una cadena con un marcador de parámetro (%s) por cada campo de la entidad, separados por comas. Sigue el
+    mismo orden que get_field_names_as_str_for_insert.
+    :param base_entity_type: Tipo de la entidad base.
     :return: str
     """
-    # Si 'is_id_included', incluyo el valor del campo id, sino pongo null. Útil pasarlo como False para inserts
-    base_entity_type = type(base_entity)
-    cadena = getattr(base_entity, base_entity_type.get_id_field_name_in_db()) if is_id_included else "null"
+    return ", ".join(["%s"] * len(base_entity_type.get_model_dict()))
+
+
+def get_field_values_for_insert(base_entity: BaseEntity, is_id_included: bool = False) -> tuple:
+    """
+    Devuelve una tupla con los valores de los campos de la entidad para pasarlos como parámetros de la consulta. Sigue
+    el mismo orden que get_field_names_as_str_for_insert.
+    :param base_entity: Entidad base.
+    :param is_id_included: Si True, empieza por el valor del campo id; si False, empieza con None. False por defecto.
+    :return: tuple
+    """
+    # Qué campos hay que leer y cuáles son entidades anidadas sólo depende del tipo de la entidad
+    id_field_name, fields_plan = _get_field_values_plan(type(base_entity))
+
+    # Si 'is_id_included', incluyo el valor del campo id, sino pongo None. Útil pasarlo como False para inserts
+    values: list = [getattr(base_entity, id_field_name) if is_id_included else None]
+
+    # Recorrer los campos del objeto e ir añadiendo sus valores
+    for key, referenced_id_field_name in fields_plan:
+        v = getattr(base_entity, key)
+
+        # Si el campo es de tipo BaseEntity, se usa como valor el id de la entidad referenciada
+        if v is not None and referenced_id_field_name is not None:
+            v = getattr(v, referenced_id_field_name)
 
-    # Recorrer los nombres de los campos del objeto e ir concatenándolos separados por comas
-    d = base_entity_type.get_model_dict()
+        values.append(v)
+
+    return tuple(values)
+
+
+@functools.lru_cache(maxsize=128)
+def _get_field_values_plan(base_entity_type: Type[BaseEntity]) -> Tuple[str, Tuple[Tuple[str, Union[str, None]], ...]]:
+    """
+    Resuelve, para un tipo de entidad, el nombre de su campo id y los campos cuyos valores se pasan a las sentencias
+    INSERT y UPDATE. Se cachea por tipo de entidad para no recorrer el modelo en cada registro.
+    :param base_entity_type: Tipo de la entidad base.
+    :return: Tupla con el nombre del campo id y una tupla de pares (nombre del campo, nombre del campo id de la entidad
+    referenciada o None si el campo no es una entidad anidada), en el mismo orden que get_field_names_as_str_for_insert.
+    """
+    id_field_name = base_entity_type.get_id_field_name()
+    fields_plan: List[Tuple[str, Union[str, None]]] = []
 
-    for key, value in d.items():
+    for key, value in base_entity_type.get_model_dict().items():
         # key es un string con el nombre del campo dentro del objeto.
         # Value es un objeto de tipo FieldDefinition
-        if key != base_entity_type.get_id_field_name():
-            v = getattr(base_entity, key)
-
-            # Hay que comprobar si el campo es de tipo BaseEntity, en ese caso habrá que usar el campo id de éste
-            # como valor
-            if issubclass(value.field_type, BaseEntity) and v is not None:
-                # Con esto obtengo el valor del id del campo referenciado
-                v = getattr(v, type(v).get_id_field_name())
-
-            # Si es un str, encerrarlo entre comillas simples
-            if isinstance(v, str):
-                cadena += ", '" + str(v) + "'"
-            elif isinstance(v, bytes):
-                # Si son bytes, decodificarlos como latin1
-                cadena += ", '" + v.decode("latin1") + "'"
-            elif v is None:
-                cadena += f", null"
-            else:
-                cadena += ", " + str(v)
+        if key != id_field_name:
+            fields_plan.append((key, value.field_type.get_id_field_name()
+                                if isinstance(value.field_type, type) and issubclass(value.field_type, BaseEntity)
+                                else None))
 
-    return cadena
+    return id_field_name, tuple(fields_plan)
 
 
-def get_fields_with_value_as_str_for_update(base_entity: BaseEntity):
+def get_fields_as_str_for_update(base_entity_type: Type[BaseEntity]):
     """
-    Devuelve una cadena con los valores del objeto a modo de "atributo = valor" separados por ", ".
-    :param base_entity: Entidad base.
+    Devuelve una cadena con los campos del objeto a modo de "atributo = %s" separados por ", ". Los valores se pasan
+    como parámetros de la consulta usando get_field_values_for_update.
+    :param base_entity_type: Tipo de la entidad base.
     :return: str
     """
-    base_entity_type = type(base_entity)
-    d = base_entity_type.get_model_dict()
+    id_field_name = base_entity_type.get_id_field_name()
 
     # Empiezo por el id (el nombre en el modelo de python y en la bd no tiene porqué coincidir)
-    cadena = f'{base_entity_type.get_id_field_name_in_db()} = ' \
-             f'{getattr(base_entity, base_entity_type.get_id_field_name())}'
+    fields: List[str] = [f'{base_entity_type.get_id_field_name_in_db()} = %s']
 
-    # Recorrer los nombres de los campos del objeto e ir concatenándolos separados por comas
-    for key, value in d.items():
-        # key es un string con el nombre del campo dentro del objeto.
-        # Value es un objeto de tipo FieldDefinition
-        if key != base_entity_type.get_id_field_name():
-            v = getattr(base_entity, key)
-
-            # Hay que comprobar si el campo es de tipo BaseEntity, en ese caso habrá que usar el campo id de éste
-            # como valor
-            if issubclass(value.field_type, BaseEntity) and v is not None:
-                # Con esto obtengo el valor del id del campo referenciado
-                v = getattr(v, value.field_type.get_id_field_name())
-
-            # Si es un str, encerrarlo entre comillas simples
-            if isinstance(v, str):
-                cadena = f"{cadena} , {value.name_in_db} = '{v}'"
-            elif isinstance(v, bytes):
-                # Si son bytes, decodificarlos como latin1
-                cadena = f"{cadena} , {value.name_in_db} = '{v.decode('latin1')}'"
-            elif v is None:
-                cadena = f"{cadena} , {value.name_in_db} = null"
-            else:
-                cadena = f"{cadena} , {value.name_in_db} = {v}"
+    # Recorrer los nombres de los campos del objeto e ir añadiéndolos
+    for key, value in base_entity_type.get_model_dict().items():
+        if key != id_field_name:
+            fields.append(f'{value.name_in_db} = %s')
 
-    return cadena
+    return " , ".join(fields)
+
+
+def get_field_values_for_update(base_entity: BaseEntity) -> tuple:
+    """
+    Devuelve una tupla con los valores de los campos de la entidad en el mismo orden que get_fields_as_str_for_update.
+    :param base_entity: Entidad base.
+    :return: tuple
+    """
+    return get_field_values_for_insert(base_entity, is_id_included=True)
@@ -1,4 +1,5 @@
 import abc
+import functools
 from dataclasses import dataclass
 from typing import Dict, Tuple, List
 
@@ -67,19 +68,15 @@ class BaseEntity(object, metaclass=abc.ABCMeta):
         # Lo hago porque al transformar un diccionario en un modelo, si tiene otro modelo anidado éste sigue siendo
         # un diccionario tras la transformación, con lo cual lo que hay que hacer es llamar de forma recursiva a esta
         # función para tranformar todos los modelos anidados en objetos BaseEntity
-        for key, value in entity_dict.items():
-            # El valor de la clave es un objeto FieldDefinition.
-            entity_type = value.field_type
+        # Los campos que son entidades anidadas sólo dependen de la clase, así que vienen de la caché.
+        for key, entity_type in _get_nested_entity_fields(cls):
+            other_entity = getattr(entity, key)
 
-            # Compruebo si el tipo hereda de BaseEntity
-            if issubclass(entity_type, BaseEntity):
-                other_entity = getattr(entity, key)
-
-                # si es el valor es un diccionario, llamo de forma recursiva a esta función para transformarlo
-                if isinstance(other_entity, dict):
-                    # Al llamarse de forma recursiva, se irán transformando también los objetos anidados que tenga
-                    # el diccionario
-                    setattr(entity, key, entity_type.convert_dict_to_entity(other_entity))
+            # si es el valor es un diccionario, llamo de forma recursiva a esta función para transformarlo
+            if isinstance(other_entity, dict):
+                # Al llamarse de forma recursiva, se irán transformando también los objetos anidados que tenga
+                # el diccionario
+                setattr(entity, key, entity_type.convert_dict_to_entity(other_entity))
 
         if return_non_existent_values:
             return entity, non_existent_values
@@ -141,3 +138,15 @@ class BaseEntity(object, metaclass=abc.ABCMeta):
             json_dict[key] = v.to_json() if hasattr(v, "to_json") else resolve_object_serialize(v)
 
         return json_dict
+
+
+@functools.lru_cache(maxsize=128)
+def _get_nested_entity_fields(entity_type: type) -> Tuple[Tuple[str, type], ...]:
+    """
+    Devuelve los campos de una entidad cuyo tipo hereda de BaseEntity, es decir, las entidades anidadas. Se cachea por
+    clase para no tener que comprobar el tipo de todos los campos cada vez que se convierte un registro.
+    :param entity_type: Clase que hereda de BaseEntity.
+    :return: Tupla de pares (nombre del campo, tipo de la entidad anidada).
+    """
+    return tuple((key, value.field_type) for key, value in entity_type.get_model_dict().items()
+                 if issubclass(value.field_type, BaseEntity))
@@ -157,6 +157,18 @@ def create_and_run_app(api_name: str, controllers: List[Tuple[any, str]], resour
         'db_engine': get_data_from_resource("db_engine")
     }
 
+    # Tamaño del pool de conexiones: es opcional, si no viene en el fichero de propiedades (con el prefijo 'pool_') se
+    # usan los valores por defecto de BaseDao. Es el parámetro que más influye en la latencia bajo concurrencia, así que
+    # conviene ajustarlo en cada despliegue.
+    for pool_key in ('maxconnections', 'mincached', 'maxcached', 'maxshared', 'ping'):
+        pool_value = get_data_from_resource(f"pool_{pool_key}")
+        if pool_value.isdigit():
+            db_config[pool_key] = int(pool_value)
+
+    # Con hilos de larga duración se puede usar una conexión persistente por hilo en lugar del pool compartido.
+    if get_data_from_resource("pool_persistent").lower() == 'true':
+        db_config['persistent'] = True
+
     # Configurar conexión de base dao
     # Esto va a modificar un atributo de clase de BaseDao: la idea es que estas apis se encapsulen en un virtualenv
     # para que sean independientes unas de otras, de tal modo que cada una modifique su dao y no altere el de otras
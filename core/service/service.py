@@ -1,4 +1,5 @@
 import abc
+import contextlib
 import types
 from typing import Type, Dict, Callable, List
 
@@ -122,6 +123,15 @@ class BaseService(object):
         """
         self._dao.insert(entity)
 
+    @service_function
+    def insert_many(self, entities: List[BaseEntity]):
+        """
+        Inserta varios registros en la base de datos en una sola operación.
+        :param entities: Lista de objetos del mismo tipo que heredan de BaseEntity.
+        :return: Nada.
+        """
+        self._dao.insert_many(entities)
+
     @service_function
     def update(self, entity: BaseEntity):
         """
@@ -162,6 +172,34 @@ class BaseService(object):
         return self._dao.select(filters=filters, order_by=order_by, fields=fields, group_by=group_by,
                                 joins=joins, offset=offset, limit=limit)
 
+    @service_function
+    def select_stream(self, consumer: Callable[[BaseEntity], None], fields: List[FieldClause] = None,
+                      filters: List[FilterClause] = None, order_by: List[OrderByClause] = None,
+                      joins: List[JoinClause] = None, group_by: List[GroupByClause] = None,
+                      offset: int = None, limit: int = None, chunk_size: int = 1000):
+        """
+        Igual que select, pero pensado para resultados grandes: los registros se leen del servidor en bloques, sin
+        cargarlos todos en memoria. Como el resultado ha de consumirse dentro de la transacción, en lugar de devolverlo
+        se pasa cada entidad a la función consumer según se va leyendo.
+        :param consumer: Función que recibe cada una de las entidades encontradas.
+        :param fields: Campos seleccionados.
+        :param filters: Filtros.
+        :param order_by: Cláusulas ORDER BY.
+        :param joins: Cláusulas JOIN.
+        :param group_by: Cláusulas GROUP BY.
+        :param offset: Offset del límite de la consulta.
+        :param limit: Límite de registros.
+        :param chunk_size: Número de registros que se leen del servidor en cada bloque.
+        :return: Nada.
+        """
+        # Cierro el generador explícitamente al salir, aunque consumer lance una excepción: así el cursor de servidor se
+        # cierra antes de que service_function haga rollback y devuelva la conexión al pool.
+        with contextlib.closing(self._dao.select_stream(filters=filters, order_by=order_by, fields=fields,
+                                                        group_by=group_by, joins=joins, offset=offset, limit=limit,
+                                                        chunk_size=chunk_size)) as rows:
+            for entity in rows:
+                consumer(entity)
+
     @service_function
     def count_rows(self, filters: List[FilterClause] = None, joins: List[JoinClause] = None) -> int:
         """
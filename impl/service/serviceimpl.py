@@ -72,6 +72,13 @@ class UsuarioService(BaseService):
         self.check_password(entity)
         super().insert(entity)
 
+    @service_function
+    def insert_many(self, entities: List[Usuario]):
+        # Sobrescritura de insert_many para comprobar el password de cada usuario
+        for entity in entities:
+            self.check_password(entity)
+        super().insert_many(entities)
+
     @service_function
     def update(self, entity: Usuario):
         # Sobrescritura de update para comprobar password